@@ -1,4 +1,5 @@
 import datetime
+import os
 import time
 from pathlib import Path
 from threading import Lock
@@ -7,6 +8,7 @@ import requests
 import zipfile
 import io
 import re
+import shutil
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
@@ -63,6 +65,10 @@ class AutoSubtitle(_PluginBase):
     _video_formats = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.rmvb', '.m4v', '.ts']
     # 支持的字幕格式
     _subtitle_formats = ['.srt', '.ass', '.ssa']
+    # 字幕文件大小上限
+    _max_subtitle_size: int = 10 * 1024 * 1024
+    # 目录所在磁盘最低剩余空间，低于该值时跳过下载
+    _min_free_space: int = 50 * 1024 * 1024
 
     def init_plugin(self, config: dict = None):
         """初始化插件"""
@@ -91,23 +97,23 @@ class AutoSubtitle(_PluginBase):
             self._clear_log = False
             self.__update_config()
 
-        if self._enabled or self._onlyonce:
-            if self._onlyonce:
-                self._scheduler = BackgroundScheduler(timezone=settings.TZ)
-                logger.info("自动字幕下载服务启动，立即运行一次")
-                self._scheduler.add_job(
-                    func=self.scan_and_download,
-                    trigger='date',
-                    run_date=datetime.datetime.now() + datetime.timedelta(seconds=3)
-                )
-                
-                if self._scheduler.get_jobs():
-                    self._scheduler.print_jobs()
-                    self._scheduler.start()
-                
-                # 关闭一次性开关
-                self._onlyonce = False
-                self.__update_config()
+        if self._onlyonce:
+            # 先关闭一次性开关并保存，避免配置重入时重复启动扫描
+            self._onlyonce = False
+            self.__update_config()
+            
+            self._scheduler = BackgroundScheduler(timezone=settings.TZ)
+            logger.info("自动字幕下载服务启动，立即运行一次")
+            self._scheduler.add_job(
+                func=self.scan_and_download,
+                trigger='date',
+                run_date=datetime.datetime.now() + datetime.timedelta(seconds=3),
+                id="autosubtitle_once",
+                replace_existing=True
+            )
+            
+            self._scheduler.print_jobs()
+            self._scheduler.start()
 
     def get_state(self) -> bool:
         return self._enabled
@@ -587,17 +593,26 @@ class AutoSubtitle(_PluginBase):
                         download_url, 
                         headers=headers, 
                         timeout=120,
-                        verify=True  # 验证SSL证书
+                        verify=True,  # 验证SSL证书
+                        stream=True
                     )
                     
                     if sub_response.status_code != 200:
                         logger.error(f"下载字幕文件失败，状态码：{sub_response.status_code}")
+                        sub_response.close()
                         if attempt < max_retries - 1:
                             logger.info(f"等待5秒后重试... ({attempt + 1}/{max_retries})")
                             time.sleep(5)
                             continue
                         return None
                     
+                    # 校验返回内容，避免把错误页/验证码页当作字幕保存
+                    invalid_reason = self._check_subtitle_response(sub_response)
+                    if invalid_reason:
+                        logger.error(f"字幕文件内容无效：{invalid_reason}")
+                        sub_response.close()
+                        return None
+                    
                     # 下载成功，处理内容
                     filename = subs[0].get("filename", "")
                     logger.info(f"字幕文件下载成功，文件名：{filename}")
@@ -625,6 +640,32 @@ class AutoSubtitle(_PluginBase):
         
         return None
 
+    def _check_subtitle_response(self, response: requests.Response) -> Optional[str]:
+        """校验字幕下载响应，返回无效原因，有效时返回None"""
+        content_type = response.headers.get('Content-Type', '').lower()
+        if content_type.startswith(('text/html', 'application/json', 'application/xhtml')):
+            return f"Content-Type为{content_type}"
+        
+        try:
+            content_length = int(response.headers.get('Content-Length') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > self._max_subtitle_size:
+            return f"文件过大（{content_length}字节）"
+        
+        content = response.content
+        if not content:
+            return "内容为空"
+        if len(content) > self._max_subtitle_size:
+            return f"文件过大（{len(content)}字节）"
+        
+        # 部分服务器不返回正确的Content-Type，检查开头是否为HTML
+        head = content[:64].lstrip().lower()
+        if head.startswith((b'<!doctype html', b'<html')):
+            return "返回内容为HTML页面"
+        
+        return None
+
     def _extract_subtitle_from_archive(self, archive_content: bytes, video_path: Path, filename: str) -> Optional[Path]:
         """从压缩包中提取字幕（支持zip和rar）"""
         try:
@@ -716,8 +757,16 @@ class AutoSubtitle(_PluginBase):
             else:
                 subtitle_path = video_path.parent / f"{video_path.stem}-mp.srt"
             
-            with open(subtitle_path, 'wb') as f:
-                f.write(content)
+            # 先写入临时文件再替换，避免中断时留下不完整的-mp字幕导致后续一直被跳过
+            tmp_path = subtitle_path.with_suffix(subtitle_path.suffix + '.part')
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, subtitle_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
             
             logger.info(f"字幕已保存：{subtitle_path}")
             return subtitle_path
@@ -782,6 +831,19 @@ class AutoSubtitle(_PluginBase):
         
         return video_files
 
+    def _has_free_space(self, directory: Path) -> bool:
+        """检查目录所在磁盘剩余空间是否足够保存字幕"""
+        try:
+            free = shutil.disk_usage(directory).free
+        except OSError:
+            # 目录不存在等情况交由扫描逻辑处理
+            return True
+        
+        if free < self._min_free_space:
+            logger.warning(f"目录所在磁盘剩余空间不足（{free / 1024 / 1024:.1f}MB），跳过：{directory}")
+            return False
+        return True
+
     def scan_and_download(self):
         """扫描目录并下载字幕"""
         # 检查是否已经在运行
@@ -822,6 +884,10 @@ class AutoSubtitle(_PluginBase):
                     logger.info("检测到停止信号，终止任务")
                     break
                     
+                # 磁盘空间不足时直接跳过，避免浪费API请求配额
+                if not self._has_free_space(directory):
+                    continue
+                
                 logger.info(f"正在扫描目录：{directory}")
                 video_files = self._scan_directory(directory)
                 total_videos += len(video_files)
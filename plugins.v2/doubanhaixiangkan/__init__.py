@@ -1,33 +1,265 @@
 import datetime
+import hmac
+import json
+import math
+import random
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import closing
+from dataclasses import dataclass, asdict, fields
+from functools import lru_cache
 from pathlib import Path
-from threading import Lock
-from typing import Optional, Any, List, Dict, Tuple
-from app.schemas.types import MediaType, EventType, SystemConfigKey, NotificationType
+from threading import Lock, Thread
+from typing import Optional, Any, List, Dict, Tuple, Iterable, NamedTuple, TYPE_CHECKING
 
-import pytz
 import time
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
+import requests
 
 from app import schemas
-from app.chain.media import MediaChain
-from app.db.subscribe_oper import SubscribeOper
-from app.db.user_oper import UserOper
-from app.schemas.types import MediaType, EventType, SystemConfigKey
-
-from app.chain.download import DownloadChain
-from app.chain.search import SearchChain
-from app.chain.subscribe import SubscribeChain
 from app.core.config import settings
 from app.core.event import Event
 from app.core.event import eventmanager
+from app.core.context import MediaInfo
+from app.core.meta import MetaBase
 from app.core.metainfo import MetaInfo
 from app.helper.rss import RssHelper
 from app.log import logger
 from app.plugins import _PluginBase
+from app.schemas.types import MediaType, EventType, SystemConfigKey, NotificationType
+
+# 调度器及处理链只在启用或同步时才导入，未启用插件时不增加启动开销
+if TYPE_CHECKING:
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from app.chain.download import DownloadChain
+    from app.chain.media import MediaChain
+    from app.chain.search import SearchChain
+    from app.chain.subscribe import SubscribeChain
+    from app.db.subscribe_oper import SubscribeOper
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 lock = Lock()
 
+@lru_cache(maxsize=1)
+def _get_chains() -> Tuple["MediaChain", "DownloadChain", "SubscribeChain", "SearchChain", "SubscribeOper"]:
+    """
+    获取处理链实例，插件生命周期内复用，避免每次同步重复构造
+    """
+    from app.chain.download import DownloadChain
+    from app.chain.media import MediaChain
+    from app.chain.search import SearchChain
+    from app.chain.subscribe import SubscribeChain
+    from app.db.subscribe_oper import SubscribeOper
+    return MediaChain(), DownloadChain(), SubscribeChain(), SearchChain(), SubscribeOper()
+
+
+# 历史记录操作类型显示名称
+_ACTION_MAP = {"download": "下载", "subscribe": "订阅", "exist": "存在"}
+
+# 历史记录卡片中不随记录变化的属性，只构造一次，各卡片共享引用
+_CARD_CLOSE_BTN_PROPS = {'innerClass': 'absolute top-0 right-0'}
+_CARD_ROW_PROPS = {'class': 'd-flex justify-space-start flex-nowrap flex-row'}
+_CARD_TITLE_PROPS = {'class': 'ps-1 pe-5 break-words whitespace-break-spaces'}
+_CARD_TEXT_PROPS = {'class': 'pa-0 px-2'}
+
+
+class DoubanUser(NamedTuple):
+    """
+    同步用户配置
+    """
+    # 用户名
+    username: str
+    # 每日限额：-1表示不限制，0表示不处理，>0表示每日最多处理的数量
+    limit: int
+
+
+class WishItem(NamedTuple):
+    """
+    通过预过滤的想看条目，只保留后续处理需要的字段
+    """
+    # 豆瓣ID
+    doubanid: str
+    # 标题（已去除"想看"前缀）
+    title: str
+
+
+@dataclass(slots=True)
+class HistoryEntry:
+    """
+    豆瓣想看同步历史记录
+    """
+    action: str = ""
+    title: str = ""
+    type: str = ""
+    year: Optional[str] = None
+    poster: Optional[str] = None
+    overview: Optional[str] = None
+    tmdbid: Optional[int] = None
+    doubanid: str = ""
+    subscriber: str = ""
+    time: str = ""
+    time_ts: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HistoryEntry":
+        return cls(**{k: v for k, v in data.items() if k in _HISTORY_FIELDS})
+
+
+_HISTORY_FIELDS = frozenset(f.name for f in fields(HistoryEntry))
+
+
+def _json_dumps(obj: Any) -> str:
+    """
+    序列化为JSON字符串，优先使用orjson（原生支持dataclass）
+    """
+    if orjson:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, ensure_ascii=False, default=asdict)
+
+
+def _json_loads(data: str) -> Any:
+    """
+    反序列化JSON字符串
+    """
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class HistoryStore:
+    """
+    SQLite历史记录存储，按豆瓣ID建主键索引，内存中同样按豆瓣ID索引
+    新增及删除先在内存中生效，调用flush后在一个事务中写入数据库
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._lock = Lock()
+        # 豆瓣ID -> 记录，保持写入顺序，首次访问时从数据库加载
+        self._entries: Optional[Dict[str, HistoryEntry]] = None
+        # 待写入数据库的变更：豆瓣ID -> 记录，None表示删除
+        self._pending: Dict[str, Optional[HistoryEntry]] = {}
+        self._schema_ready = False
+
+    def exists(self) -> bool:
+        return self._path.exists()
+
+    @property
+    def dirty(self) -> bool:
+        """
+        是否有未写入数据库的变更
+        """
+        return bool(self._pending)
+
+    @property
+    def pending_count(self) -> int:
+        """
+        未写入数据库的变更数
+        """
+        return len(self._pending)
+
+    def __contains__(self, doubanid: str) -> bool:
+        with self._lock:
+            return doubanid in self.__load()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self.__load())
+
+    def get(self, doubanid: str) -> Optional[HistoryEntry]:
+        with self._lock:
+            return self.__load().get(doubanid)
+
+    def values(self) -> List[HistoryEntry]:
+        """
+        返回全部记录的副本
+        """
+        with self._lock:
+            return list(self.__load().values())
+
+    def add(self, entry: HistoryEntry):
+        """
+        新增记录，同一豆瓣ID只保留最新一条，调用flush后写入数据库
+        """
+        with self._lock:
+            entries = self.__load()
+            entries.pop(entry.doubanid, None)
+            entries[entry.doubanid] = entry
+            self._pending[entry.doubanid] = entry
+
+    def remove(self, doubanid: str) -> bool:
+        """
+        删除记录，调用flush后写入数据库
+        """
+        with self._lock:
+            if self.__load().pop(doubanid, None) is None:
+                return False
+            self._pending[doubanid] = None
+            return True
+
+    def flush(self):
+        """
+        将待写入的变更在一个事务中写入数据库
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            upserts = [self.__to_row(e) for e in self._pending.values() if e is not None]
+            deletes = [(doubanid,) for doubanid, e in self._pending.items() if e is None]
+            with closing(self.__connect()) as conn, conn:
+                if deletes:
+                    conn.executemany("DELETE FROM history WHERE doubanid = ?", deletes)
+                if upserts:
+                    conn.executemany("INSERT OR REPLACE INTO history (doubanid, subscriber, time_ts, payload) "
+                                     "VALUES (?, ?, ?, ?)", upserts)
+            self._pending = {}
+
+    def rewrite(self, entries: Iterable[HistoryEntry]):
+        """
+        用给定记录替换全部历史记录
+        """
+        with self._lock:
+            self._entries = {e.doubanid: e for e in entries}
+            self._pending = {}
+            with closing(self.__connect()) as conn, conn:
+                conn.execute("DELETE FROM history")
+                conn.executemany("INSERT INTO history (doubanid, subscriber, time_ts, payload) VALUES (?, ?, ?, ?)",
+                                 [self.__to_row(e) for e in self._entries.values()])
+
+    def __connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path)
+        if not self._schema_ready:
+            self.__ensure_schema(conn)
+            self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def __ensure_schema(conn: sqlite3.Connection):
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS history ("
+                         "doubanid TEXT PRIMARY KEY, subscriber TEXT, time_ts INTEGER, payload TEXT NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_subscriber ON history (subscriber)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_time_ts ON history (time_ts)")
+
+    @staticmethod
+    def __to_row(entry: HistoryEntry) -> tuple:
+        return entry.doubanid, entry.subscriber, entry.time_ts, _json_dumps(entry)
+
+    def __load(self) -> Dict[str, HistoryEntry]:
+        if self._entries is not None:
+            return self._entries
+        entries: Dict[str, HistoryEntry] = {}
+        if self._path.exists():
+            with closing(self.__connect()) as conn:
+                # 替换写入会生成新的rowid，按rowid排序即为写入顺序
+                for doubanid, payload in conn.execute("SELECT doubanid, payload FROM history ORDER BY rowid"):
+                    entries[doubanid] = HistoryEntry.from_dict(_json_loads(payload))
+        self._entries = entries
+        return entries
+
 
 class DoubanHaixiangkan(_PluginBase):
     # 插件名称
@@ -51,40 +283,100 @@ class DoubanHaixiangkan(_PluginBase):
 
     # 私有变量
     _interests_url: str = "https://www.douban.com/feed/people/%s/interests"
-    _scheduler: Optional[BackgroundScheduler] = None
-    _cache_path: Optional[Path] = None
+    _scheduler: Optional["BackgroundScheduler"] = None
 
     # 配置属性
     _enabled: bool = False
     _onlyonce: bool = False
     _cron: str = ""
     _notify: bool = False
+    _batch_notify: bool = False  # 每个用户同步完成后合并为一条通知
     _days: int = 7
     _users: str = ""
     _clear: bool = False
     _clearflag: bool = False
     _search_download = False
     _request_interval: int = 3  # RSS请求间隔秒数
+    _rss_workers: int = 4  # 并发获取RSS的最大线程数
+    _identify_workers: int = 8  # 并发识别媒体信息的最大线程数
+    _identify_batch: int = 16  # 每批并发识别的条目数，达到每日限额时最多浪费一批
+    # RSS请求限速：保证相邻两次请求的发起间隔不小于_request_interval
+    _rate_lock = Lock()
+    _last_request_time: float = 0
+    # 订阅链，首次使用时构造
+    _subscribe_chain: Optional["SubscribeChain"] = None
+    # RSS请求头及解析器，初始化时构造一次
+    _rss_headers: Dict[str, str] = {}
+    _rss: Optional[RssHelper] = None
+    # 用户列表解析缓存：(原始配置, 豆瓣ID -> 用户配置)
+    _users_cache: Optional[Tuple[str, Dict[str, DoubanUser]]] = None
+    # 历史记录存储
+    _history_store: Optional[HistoryStore] = None
+    # 同步过程中累计多少条待写入记录时中途落盘一次
+    _flush_batch: int = 50
+    # 最近一次应用的配置摘要
+    _config_hash: Optional[int] = None
+    # 详情页最多展示的记录数
+    _page_size: int = 200
+    # 单次同步内的外部请求结果缓存：douban -> 豆瓣详情，tmdb -> TMDB信息，media -> 识别结果，
+    # exists -> 媒体库存在情况，identify -> 豆瓣条目最终识别结果（多个用户想看同一条目时共用）
+    _run_cache: Dict[str, dict] = {}
 
     def init_plugin(self, config: dict = None):
 
+        # 配置未变化且无一次性操作时无需重建
+        config_hash = self.__config_hash(config)
+        if config_hash is not None and config_hash == self._config_hash \
+                and self._history_store is not None \
+                and not config.get("onlyonce") and not config.get("clear"):
+            logger.debug("豆瓣想看配置未变化，跳过重新初始化")
+            return
+        self._config_hash = config_hash
+
         # 停止现有任务
         self.stop_service()
 
+        # RSS请求头及解析器
+        self._rss_headers = {
+            "User-Agent": getattr(settings, 'USER_AGENT', None)
+                          or "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Referer": "https://www.douban.com/",
+            "Accept": "application/rss+xml, application/xml, text/xml, */*",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
+        }
+        self._rss = RssHelper()
+
+        # 历史记录存储
+        data_path = self.get_data_path()
+        self._history_store = HistoryStore(data_path / "history.db")
+        if not self._history_store.exists():
+            # 首次使用时从插件数据迁移历史记录，此后以数据库为准，插件数据中的history不再更新
+            self._history_store.rewrite(HistoryEntry.from_dict(h) for h in self.get_data('history') or [])
+
         # 配置
         if config:
             self._enabled = config.get("enabled")
             self._cron = config.get("cron")
             self._notify = config.get("notify")
+            self._batch_notify = config.get("batch_notify", False)
             self._days = config.get("days")
+            # 同步天数非数字时使用默认值，避免同步时整体失败
+            try:
+                float(self._days)
+            except (TypeError, ValueError):
+                logger.warn("同步天数配置无效：%s，使用默认值7天", self._days)
+                self._days = 7
             self._users = config.get("users")
             self._onlyonce = config.get("onlyonce")
             self._clear = config.get("clear")
             self._search_download = config.get("search_download")
             self._request_interval = config.get("request_interval", 3)
 
+        # 预先解析用户列表，配置不变时同步直接使用缓存
+        self.__parse_user_list()
+
         if self._clear:
-            self.save_data('history', [])
+            self._history_store.rewrite([])
             self.save_data('daily_stats', {})
             logger.info("已清理豆瓣想看历史记录与统计数据")
             self._clear = False
@@ -93,8 +385,11 @@ class DoubanHaixiangkan(_PluginBase):
 
         if self._enabled or self._onlyonce:
             if self._onlyonce:
+                import pytz
+                from apscheduler.schedulers.background import BackgroundScheduler
+
                 self._scheduler = BackgroundScheduler(timezone=settings.TZ)
-                logger.info(f"豆瓣想看服务启动，立即运行一次")
+                logger.info("豆瓣想看服务启动，立即运行一次")
                 self._scheduler.add_job(func=self.sync, trigger='date',
                                         run_date=datetime.datetime.now(
                                             tz=pytz.timezone(settings.TZ)) + datetime.timedelta(seconds=3)
@@ -111,6 +406,15 @@ class DoubanHaixiangkan(_PluginBase):
                 # 保存配置
                 self.__update_config()
 
+    @staticmethod
+    def __config_hash(config: Optional[dict]) -> Optional[int]:
+        """
+        计算配置摘要，用于判断配置是否变化
+        """
+        if not config:
+            return None
+        return hash(tuple(sorted((k, str(v)) for k, v in config.items())))
+
     def get_state(self) -> bool:
         return self._enabled
 
@@ -161,6 +465,8 @@ class DoubanHaixiangkan(_PluginBase):
         }]
         """
         if self._enabled and self._cron:
+            from apscheduler.triggers.cron import CronTrigger
+
             return [
                 {
                     "id": "DoubanHaixiangkan",
@@ -352,6 +658,22 @@ class DoubanHaixiangkan(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'batch_notify',
+                                            'label': '汇总通知',
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     },
@@ -371,7 +693,8 @@ class DoubanHaixiangkan(_PluginBase):
                                             'variant': 'tonal',
                                             'text': '用户列表格式说明：豆瓣ID,用户名,每日限额|豆瓣ID,用户名,每日限额，多个用户用竖线|分隔。每日限额-1表示不限制，0表示不处理该用户。'
                                                     '搜索下载开启后，会优先按订阅优先级规则组搜索过滤下载，搜索站点为设置的订'
-                                                    '阅站点，下载失败/无资源/剧集不完整时仍会添加订阅'
+                                                    '阅站点，下载失败/无资源/剧集不完整时仍会添加订阅。'
+                                                    '汇总通知开启后，每个用户同步完成时合并发送一条通知，不再逐部发送'
                                         }
                                     }
                                 ]
@@ -383,6 +706,7 @@ class DoubanHaixiangkan(_PluginBase):
         ], {
             "enabled": False,
             "notify": True,
+            "batch_notify": False,
             "onlyonce": False,
             "cron": "*/30 * * * *",
             "days": 7,
@@ -397,7 +721,7 @@ class DoubanHaixiangkan(_PluginBase):
         拼装插件详情页面，需要返回页面配置，同时附带数据
         """
         # 查询同步详情
-        historys = self.get_data('history')
+        historys = self._history_store.values()
         if not historys:
             return [
                 {
@@ -408,125 +732,114 @@ class DoubanHaixiangkan(_PluginBase):
                     }
                 }
             ]
-        # 数据按时间降序排序
-        historys = sorted(historys, key=lambda x: x.get('time'), reverse=True)
+        # 数据按时间降序排序，旧数据没有time_ts时按时间字符串排序
+        historys.sort(key=lambda x: (x.time_ts, x.time), reverse=True)
+        # 只展示最近的记录
+        historys = historys[:self._page_size]
         # 拼装页面
-        contents = []
-        for history in historys:
-            title = history.get("title")
-            poster = history.get("poster")
-            mtype = history.get("type")
-            time_str = history.get("time")
-            doubanid = history.get("doubanid")
-            subscriber = history.get("subscriber", "未知用户")
-            action = "下载" if history.get("action") == "download" else "订阅" if history.get("action") == "subscribe" \
-                else "存在" if history.get("action") == "exist" else history.get("action")
-            contents.append(
+        api_token = settings.API_TOKEN
+        return [
+            {
+                'component': 'div',
+                'props': {
+                    'class': 'grid gap-3 grid-info-card',
+                },
+                'content': [self.__build_history_card(h, api_token) for h in historys]
+            }
+        ]
+
+    @staticmethod
+    def __build_history_card(history: HistoryEntry, api_token: str) -> dict:
+        """
+        生成单条历史记录卡片
+        """
+        title = history.title
+        poster = history.poster
+        mtype = history.type
+        time_str = history.time
+        doubanid = history.doubanid
+        subscriber = history.subscriber or "未知用户"
+        action = _ACTION_MAP.get(history.action, history.action)
+        return {
+            'component': 'VCard',
+            'content': [
+                {
+                    "component": "VDialogCloseBtn",
+                    "props": _CARD_CLOSE_BTN_PROPS,
+                    'events': {
+                        'click': {
+                            'api': 'plugin/doubanhaixiangkan/delete_history',
+                            'method': 'get',
+                            'params': {
+                                'doubanid': doubanid,
+                                'apikey': api_token
+                            }
+                        }
+                    },
+                },
                 {
-                    'component': 'VCard',
+                    'component': 'div',
+                    'props': _CARD_ROW_PROPS,
                     'content': [
                         {
-                            "component": "VDialogCloseBtn",
-                            "props": {
-                                'innerClass': 'absolute top-0 right-0',
-                            },
-                            'events': {
-                                'click': {
-                                    'api': 'plugin/doubanhaixiangkan/delete_history',
-                                    'method': 'get',
-                                    'params': {
-                                        'doubanid': doubanid,
-                                        'apikey': settings.API_TOKEN
+                            'component': 'div',
+                            'content': [
+                                {
+                                    'component': 'VImg',
+                                    'props': {
+                                        'src': poster,
+                                        'height': 120,
+                                        'width': 80,
+                                        'aspect-ratio': '2/3',
+                                        'class': 'object-cover shadow ring-gray-500',
+                                        'cover': True
                                     }
                                 }
-                            },
+                            ]
                         },
                         {
                             'component': 'div',
-                            'props': {
-                                'class': 'd-flex justify-space-start flex-nowrap flex-row',
-                            },
                             'content': [
                                 {
-                                    'component': 'div',
+                                    'component': 'VCardTitle',
+                                    'props': _CARD_TITLE_PROPS,
                                     'content': [
                                         {
-                                            'component': 'VImg',
+                                            'component': 'a',
                                             'props': {
-                                                'src': poster,
-                                                'height': 120,
-                                                'width': 80,
-                                                'aspect-ratio': '2/3',
-                                                'class': 'object-cover shadow ring-gray-500',
-                                                'cover': True
-                                            }
+                                                'href': f"https://movie.douban.com/subject/{doubanid}",
+                                                'target': '_blank'
+                                            },
+                                            'text': title
                                         }
                                     ]
                                 },
                                 {
-                                    'component': 'div',
-                                    'content': [
-                                        {
-                                            'component': 'VCardTitle',
-                                            'props': {
-                                                'class': 'ps-1 pe-5 break-words whitespace-break-spaces'
-                                            },
-                                            'content': [
-                                                {
-                                                    'component': 'a',
-                                                    'props': {
-                                                        'href': f"https://movie.douban.com/subject/{doubanid}",
-                                                        'target': '_blank'
-                                                    },
-                                                    'text': title
-                                                }
-                                            ]
-                                        },
-                                        {
-                                            'component': 'VCardText',
-                                            'props': {
-                                                'class': 'pa-0 px-2'
-                                            },
-                                            'text': f'类型：{mtype}'
-                                        },
-                                        {
-                                            'component': 'VCardText',
-                                            'props': {
-                                                'class': 'pa-0 px-2'
-                                            },
-                                            'text': f'时间：{time_str}'
-                                        },
-                                        {
-                                            'component': 'VCardText',
-                                            'props': {
-                                                'class': 'pa-0 px-2'
-                                            },
-                                            'text': f'操作：{action}'
-                                        },
-                                        {
-                                            'component': 'VCardText',
-                                            'props': {
-                                                'class': 'pa-0 px-2'
-                                            },
-                                            'text': f'订阅人：{subscriber}'
-                                        }
-                                    ]
+                                    'component': 'VCardText',
+                                    'props': _CARD_TEXT_PROPS,
+                                    'text': f'类型：{mtype}'
+                                },
+                                {
+                                    'component': 'VCardText',
+                                    'props': _CARD_TEXT_PROPS,
+                                    'text': f'时间：{time_str}'
+                                },
+                                {
+                                    'component': 'VCardText',
+                                    'props': _CARD_TEXT_PROPS,
+                                    'text': f'操作：{action}'
+                                },
+                                {
+                                    'component': 'VCardText',
+                                    'props': _CARD_TEXT_PROPS,
+                                    'text': f'订阅人：{subscriber}'
                                 }
                             ]
                         }
                     ]
                 }
-            )
-
-        return [
-            {
-                'component': 'div',
-                'props': {
-                    'class': 'grid gap-3 grid-info-card',
-                },
-                'content': contents
-            }
-        ]
+            ]
+        }
 
     def __update_config(self):
         """
@@ -535,6 +848,7 @@ class DoubanHaixiangkan(_PluginBase):
         self.update_config({
             "enabled": self._enabled,
             "notify": self._notify,
+            "batch_notify": self._batch_notify,
             "onlyonce": self._onlyonce,
             "cron": self._cron,
             "days": self._days,
@@ -548,15 +862,16 @@ class DoubanHaixiangkan(_PluginBase):
         """
         删除同步历史记录
         """
-        if apikey != settings.API_TOKEN:
+        # 定长时间比较，避免通过响应时间猜测密钥
+        if not hmac.compare_digest((apikey or "").encode(), (settings.API_TOKEN or "").encode()):
             return schemas.Response(success=False, message="API密钥错误")
         # 历史记录
-        historys = self.get_data('history')
-        if not historys:
+        if not len(self._history_store):
             return schemas.Response(success=False, message="未找到历史记录")
-        # 删除指定记录
-        historys = [h for h in historys if h.get("doubanid") != doubanid]
-        self.save_data('history', historys)
+        # 删除指定记录，记录不存在时不写入
+        if not self._history_store.remove(doubanid):
+            return schemas.Response(success=False, message="未找到该记录")
+        self._history_store.flush()
         return schemas.Response(success=True, message="删除成功")
 
     def stop_service(self):
@@ -570,14 +885,18 @@ class DoubanHaixiangkan(_PluginBase):
                     self._scheduler.shutdown()
                 self._scheduler = None
         except Exception as e:
-            logger.error("退出插件失败：%s" % str(e))
+            logger.error("退出插件失败：%s", e)
 
-    def __parse_user_list(self) -> Dict[str, Tuple[str, int]]:
+    def __parse_user_list(self) -> Dict[str, DoubanUser]:
         """
-        解析用户列表，返回豆瓣ID到(用户名, 每日限额)的映射
+        解析用户列表，返回豆瓣ID到用户配置的映射
         格式：豆瓣ID,用户名,每日限额|豆瓣ID,用户名,每日限额
         每日限额：-1表示不限制，0表示不处理，>0表示每日最多处理的数量
+        解析结果按原始配置缓存，配置不变时直接返回
         """
+        if self._users_cache and self._users_cache[0] == self._users:
+            return self._users_cache[1]
+        
         user_dict = {}
         if not self._users:
             return user_dict
@@ -597,14 +916,15 @@ class DoubanHaixiangkan(_PluginBase):
                     try:
                         daily_limit = int(parts[2].strip())
                     except ValueError:
-                        logger.warn(f"用户 {username} 的每日限额配置无效，使用默认值-1（不限制）")
+                        logger.warn("用户 %s 的每日限额配置无效，使用默认值-1（不限制）", username)
                         daily_limit = -1
                 
                 if douban_id and username:
-                    user_dict[douban_id] = (username, daily_limit)
+                    user_dict[douban_id] = DoubanUser(username, daily_limit)
                     limit_desc = "不限制" if daily_limit == -1 else f"{daily_limit}部" if daily_limit > 0 else "不处理"
-                    logger.info(f"解析用户配置：豆瓣ID={douban_id}, 用户名={username}, 每日限额={limit_desc}")
+                    logger.debug("解析用户配置：豆瓣ID=%s, 用户名=%s, 每日限额=%s", douban_id, username, limit_desc)
         
+        self._users_cache = (self._users, user_dict)
         return user_dict
 
 
@@ -631,19 +951,20 @@ class DoubanHaixiangkan(_PluginBase):
         获取并清理过期的每日统计数据（保留最近7天）
         """
         stats = self.__get_daily_stats()
-        current_date = datetime.datetime.now()
-        return {
-            date: users for date, users in stats.items()
-            if (current_date - datetime.datetime.strptime(date, "%Y-%m-%d")).days <= 7
-        }
+        # 日期键固定为YYYY-MM-DD格式，字符串比较即为时间先后比较
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=7)).strftime("%Y-%m-%d")
+        return {date: users for date, users in stats.items() if date >= cutoff}
 
-    def __can_process_today(self, username: str, daily_limit: int) -> bool:
+    @staticmethod
+    def __can_process_today(stats: Dict[str, Dict[str, int]], today: str, user: DoubanUser) -> bool:
         """
         检查每日限额
-        :param username: 用户名
-        :param daily_limit: 每日限额（-1表示不限制，0表示不处理，>0表示限制数量）
+        :param stats: 每日统计数据
+        :param today: 今天的日期字符串
+        :param user: 用户配置
         :return: True表示可以处理，False表示已达限额
         """
+        username, daily_limit = user
         # -1表示不限制
         if daily_limit == -1:
             return True
@@ -652,40 +973,26 @@ class DoubanHaixiangkan(_PluginBase):
         if daily_limit == 0:
             return False
         
-        # 获取今天的日期
-        today = datetime.datetime.now().strftime("%Y-%m-%d")
-        
-        # 获取并清理统计数据
-        stats = self.__get_clean_daily_stats()
-        
         # 获取今天的统计
         today_stats = stats.get(today, {})
         current_count = today_stats.get(username, 0)
         
         # 检查是否超限
         if current_count >= daily_limit:
-            logger.info(f"用户 {username} 今日已处理 {current_count}/{daily_limit} 部，已达限额")
+            logger.info("用户 %s 今日已处理 %s/%s 部，已达限额", username, current_count, daily_limit)
             return False
         
         return True
 
-    def __increment_daily_count(self, username: str, daily_limit: int):
+    def __wait_request_slot(self):
         """
-        成功处理后更新每日计数
+        等待到允许发起下一次RSS请求，多线程并发获取时仍按请求间隔错开
         """
-        if daily_limit <= 0:
-            return
-        if daily_limit == -1:
-            return
-
-        # 获取并清理统计数据
-        stats = self.__get_clean_daily_stats()
-        today = datetime.datetime.now().strftime("%Y-%m-%d")
-        today_stats = stats.get(today, {})
-        today_stats[username] = today_stats.get(username, 0) + 1
-        stats[today] = today_stats
-        self.__save_daily_stats(stats)
-        logger.info(f"用户 {username} 今日已处理 {today_stats[username]}/{daily_limit} 部")
+        with self._rate_lock:
+            wait_time = self._last_request_time + self._request_interval - time.time()
+            if wait_time > 0:
+                time.sleep(wait_time)
+            self._last_request_time = time.time()
 
     def __fetch_rss_with_retry(self, url: str, max_retries: int = 3) -> Optional[List]:
         """
@@ -694,238 +1001,423 @@ class DoubanHaixiangkan(_PluginBase):
         :param max_retries: 最大重试次数
         :return: RSS结果列表或None
         """
-        # 准备请求头
-        headers = {
-            "User-Agent": settings.USER_AGENT if hasattr(settings, 'USER_AGENT') 
-                         else "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            "Referer": "https://www.douban.com/",
-            "Accept": "application/rss+xml, application/xml, text/xml, */*",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"
-        }
-        
         for attempt in range(max_retries):
             try:
-                results = RssHelper().parse(url, headers=headers)
+                self.__wait_request_slot()
+                results = self._rss.parse(url, headers=self._rss_headers)
                 if results:
                     return results
                 else:
-                    logger.warn(f"RSS返回空数据，第 {attempt + 1}/{max_retries} 次重试，URL: {url}")
+                    logger.warn("RSS返回空数据，第 %s/%s 次重试，URL: %s", attempt + 1, max_retries, url)
             except Exception as e:
-                logger.error(f"RSS请求异常，第 {attempt + 1}/{max_retries} 次重试，错误: {str(e)}, URL: {url}")
+                if not self.__is_transient_error(e):
+                    logger.error("RSS请求失败，错误不可恢复，不再重试，错误: %s, URL: %s", e, url)
+                    return None
+                logger.error("RSS请求异常，第 %s/%s 次重试，错误: %s, URL: %s", attempt + 1, max_retries, e, url)
             
             # 如果不是最后一次，等待后重试
             if attempt < max_retries - 1:
-                wait_time = (attempt + 1) * 2  # 递增等待时间：2秒、4秒、6秒
-                logger.info(f"等待 {wait_time} 秒后重试...")
+                # 指数退避加随机抖动，避免多个用户的重试同时打到豆瓣
+                wait_time = min(30, 2 ** attempt) + random.random()
+                logger.info("等待 %.1f 秒后重试...", wait_time)
                 time.sleep(wait_time)
         
         return None
 
-    def sync(self):
+    @staticmethod
+    def __is_transient_error(e: Exception) -> bool:
+        """
+        判断请求异常是否值得重试：超时、连接错误及5xx可重试，4xx等其他错误直接放弃
+        """
+        if isinstance(e, requests.exceptions.HTTPError):
+            response = e.response
+            return response is None or response.status_code >= 500
+        return isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError))
+
+    def __fetch_user_feeds(self, douban_ids: List[str]) -> Dict[str, Optional[List]]:
+        """
+        使用线程池并发获取多个用户的RSS数据
+        :param douban_ids: 豆瓣ID列表
+        :return: 豆瓣ID到RSS结果列表的映射
+        """
+        feeds = {}
+        if not douban_ids:
+            return feeds
+        
+        with ThreadPoolExecutor(max_workers=min(self._rss_workers, len(douban_ids))) as executor:
+            # 请求发起间隔由__wait_request_slot控制，提交时无需等待
+            futures = {
+                executor.submit(self.__fetch_rss_with_retry, self._interests_url % douban_id): douban_id
+                for douban_id in douban_ids
+            }
+            
+            for future in as_completed(futures):
+                douban_id = futures[future]
+                try:
+                    feeds[douban_id] = future.result()
+                except Exception as e:
+                    logger.error("获取豆瓣ID %s 的RSS数据出错：%s", douban_id, e)
+                    feeds[douban_id] = None
+        
+        return feeds
+
+    @staticmethod
+    def __unique_results(results: List[dict]) -> List[dict]:
+        """
+        按豆瓣ID去重RSS结果，保留首次出现的条目，无链接的条目原样保留
+        """
+        seen = set()
+        unique_results = []
+        for result in results:
+            link = result.get("link")
+            if link:
+                doubanid = link.rsplit("/", 2)[-2]
+                if doubanid in seen:
+                    continue
+                seen.add(doubanid)
+            unique_results.append(result)
+        return unique_results
+
+    @staticmethod
+    def __prefilter(results: List[dict], pubdate_cutoff: datetime.datetime, settled_ids: set,
+                    errors: List[Tuple[str, str]]) -> Tuple[List[WishItem], int]:
+        """
+        无需网络请求的条目过滤：非想看、无链接、超出同步天数及本次同步已确认无需处理的条目
+        :param results: RSS条目
+        :param pubdate_cutoff: 发布时间早于等于该时间的条目视为超期
+        :param settled_ids: 本次同步已确认无需处理的豆瓣ID
+        :param errors: 处理出错的条目，出错时追加(标题, 错误)
+        :return: 待处理条目及跳过数量
+        """
+        candidates: List[WishItem] = []
+        skipped = 0
+        for result in results:
+            try:
+                raw_title = result.get("title") or ""
+                dtype, title = raw_title[:2], raw_title[2:]
+                if dtype != "想看":
+                    logger.info('标题：%s，非想看数据，跳过', title)
+                    skipped += 1
+                    continue
+                link = result.get("link")
+                if not link:
+                    logger.warn('标题：%s，未获取到链接，跳过', title)
+                    skipped += 1
+                    continue
+
+                # 判断是否在天数范围，RSS按时间倒序排列，遇到超期条目后其余条目均已超期
+                pubdate: Optional[datetime.datetime] = result.get("pubdate")
+                if pubdate:
+                    if pubdate <= pubdate_cutoff:
+                        logger.info('已超过同步天数，标题：%s，发布时间：%s，停止处理后续条目', title, pubdate)
+                        skipped += 1
+                        break
+
+                doubanid = link.rsplit("/", 2)[-2]
+
+                # 检查是否处理过
+                if not doubanid:
+                    continue
+
+                if doubanid in settled_ids:
+                    logger.info('标题:%s,豆瓣ID:%s 本次同步已确认无需处理,跳过', title, doubanid)
+                    skipped += 1
+                    continue
+                candidates.append(WishItem(doubanid, title))
+            except Exception as err:
+                errors.append((result.get("title") or "", str(err)))
+        return candidates, skipped
+
+    def __get_douban_info(self, doubanid: str) -> Optional[dict]:
+        """
+        获取豆瓣详情，同一次同步内相同豆瓣ID只请求一次
+        """
+        cache = self._run_cache["douban"]
+        if doubanid not in cache:
+            cache[doubanid] = self.chain.douban_info(doubanid=doubanid)
+        return cache[doubanid]
+
+    def __get_tmdbinfo(self, mediachain: "MediaChain", doubanid: str, mtype: MediaType) -> Optional[dict]:
+        """
+        通过豆瓣ID获取TMDB信息，同一次同步内相同豆瓣ID和类型只请求一次
+        """
+        cache = self._run_cache["tmdb"]
+        key = (doubanid, mtype)
+        if key not in cache:
+            cache[key] = mediachain.get_tmdbinfo_by_doubanid(doubanid=doubanid, mtype=mtype)
+        return cache[key]
+
+    def __recognize_media(self, meta, doubanid: str = None, tmdbid: int = None):
+        """
+        识别媒体信息，同一次同步内相同ID和类型只识别一次
+        """
+        cache = self._run_cache["media"]
+        key = (doubanid, tmdbid, meta.type)
+        if key not in cache:
+            if tmdbid:
+                cache[key] = self.chain.recognize_media(meta=meta, tmdbid=tmdbid)
+            else:
+                cache[key] = self.chain.recognize_media(meta=meta, doubanid=doubanid)
+        return cache[key]
+
+    def __get_no_exists_info(self, downloadchain: "DownloadChain", meta: MetaBase, mediainfo: MediaInfo) -> tuple:
+        """
+        查询媒体库缺失情况，同一次同步内相同媒体只查询一次
+        """
+        cache = self._run_cache["exists"]
+        key = (mediainfo.type, mediainfo.tmdb_id or mediainfo.douban_id)
+        if key not in cache:
+            cache[key] = downloadchain.get_no_exists_info(meta=meta, mediainfo=mediainfo)
+        return cache[key]
+
+    def __identify(self, mediachain: "MediaChain", title: str, doubanid: str) -> Tuple[MetaBase, Optional[MediaInfo]]:
+        """
+        识别豆瓣条目对应的媒体信息，只读取外部数据，不修改历史记录及统计
+        :return: 元数据及媒体信息，识别失败时媒体信息为None
+        """
+        meta = MetaInfo(title=title)
+        douban_info = self.__get_douban_info(doubanid)
+        meta.type = MediaType.MOVIE if douban_info.get("type") == "movie" else MediaType.TV
+        if settings.RECOGNIZE_SOURCE == "themoviedb":
+            tmdbinfo = self.__get_tmdbinfo(mediachain, doubanid, meta.type)
+            if not tmdbinfo:
+                logger.warn('未能通过豆瓣ID %s 获取到TMDB信息，标题：%s，豆瓣ID：%s，尝试回退豆瓣识别', doubanid, title, doubanid)
+                mediainfo = self.__recognize_media(meta=meta, doubanid=doubanid)
+                if not mediainfo:
+                    logger.warn('回退豆瓣识别失败，豆瓣ID：%s', doubanid)
+            else:
+                mediainfo = self.__recognize_media(meta=meta, tmdbid=tmdbinfo.get("id"))
+                if not mediainfo:
+                    logger.warn('TMDBID %s 未识别到媒体信息，尝试回退豆瓣识别', tmdbinfo.get("id"))
+                    mediainfo = self.__recognize_media(meta=meta, doubanid=doubanid)
+                    if not mediainfo:
+                        logger.warn('回退豆瓣识别失败，豆瓣ID：%s', doubanid)
+        else:
+            mediainfo = self.__recognize_media(meta=meta, doubanid=doubanid)
+            if not mediainfo:
+                logger.warn('豆瓣ID %s 未识别到媒体信息', doubanid)
+        self._run_cache["identify"][doubanid] = (meta, mediainfo)
+        return meta, mediainfo
+
+    def __identify_batch(self, mediachain: "MediaChain",
+                         candidates: List[WishItem]) -> List[Future]:
+        """
+        使用线程池并发识别一批条目，返回与条目顺序一致的Future列表，全部完成后返回
+        本次同步中其他用户已识别过的条目直接复用结果，不再提交识别
+        识别出错时异常保留在对应Future中，由调用方按条目处理
+        """
+        identified = self._run_cache["identify"]
+        futures = []
+        with ThreadPoolExecutor(max_workers=min(self._identify_workers, len(candidates))) as executor:
+            for doubanid, title in candidates:
+                if doubanid in identified:
+                    future = Future()
+                    future.set_result(identified[doubanid])
+                else:
+                    future = executor.submit(self.__identify, mediachain, title, doubanid)
+                futures.append(future)
+        return futures
+
+    def __notify_item(self, notices: Optional[List[Tuple[str, Optional[str]]]],
+                      line: str, title: str, text: str, image: Optional[str]):
+        """
+        发送单部影视的同步通知，开启汇总通知时只暂存摘要行，由调用方在用户同步完成后合并发送
+        """
+        if notices is not None:
+            notices.append((line, image))
+            return
+        self.post_message(mtype=NotificationType.Plugin, title=title, text=text, image=image)
+
+    def sync(self) -> bool:
         """
         通过用户RSS同步豆瓣想看数据
+        :return: 是否执行了本次同步，已有同步在执行时返回False
         """
-        with lock:  # 使用线程锁防止并发执行
+        # 已有同步在执行时直接跳过，不阻塞调度线程排队等待
+        if not lock.acquire(blocking=False):
+            logger.info("豆瓣想看同步正在执行中，跳过本次同步")
+            return False
+        try:
             if not self._users:
                 logger.warn("未配置用户列表")
-                return
+                return True
             
-            # 解析用户列表
             user_dict = self.__parse_user_list()
             if not user_dict:
                 logger.warn("未配置有效的用户列表")
-                return
+                return True
             
-            # 版本
-            if hasattr(settings, 'VERSION_FLAG'):
-                version = settings.VERSION_FLAG  # V2
-            else:
-                version = "v1"
+            # 重置识别缓存
+            self._run_cache = {"douban": {}, "tmdb": {}, "media": {}, "exists": {}, "identify": {}}
             
-            # 读取历史记录
+            # 历史记录按豆瓣ID索引，变更在同步结束时统一写入数据库
+            history = self._history_store
             if self._clearflag:
-                history = []
                 logger.info("清理历史记录标志已设置，将清空历史记录")
-            else:
-                history: List[dict] = self.get_data('history') or []
+                history.rewrite([])
+            # 本次同步中已确认无需处理的历史豆瓣ID，其他用户想看同一条目时直接跳过
+            settled_ids = set()
+            
+            # 同步天数：发布时间相差天数超过该值即超期，换算为超期的最小时长，循环内直接比较时间
+            days_window = datetime.timedelta(days=math.floor(float(self._days)) + 1)
+            
+            # 每日统计只在同步开始时读取一次，结束时统一保存
+            today = datetime.datetime.now().strftime("%Y-%m-%d")
+            daily_stats = self.__get_clean_daily_stats()
+            stats_dirty = False
             
             # 同步统计
             total_processed = 0
             total_skipped = 0
             total_errors = 0
             
-            for douban_id, (username, daily_limit) in user_dict.items():
-                # 检查每日限额为0的用户直接跳过
-                if daily_limit == 0:
-                    logger.info(f"用户 {username}({douban_id}) 每日限额为0，跳过处理")
+            # 处理链在所有用户及多次同步间复用
+            mediachain, downloadchain, subscribechain, searchchain, subscribeoper = _get_chains()
+            
+            # 每日限额为0或今日已达限额的用户直接跳过，不再请求其RSS
+            active_users = {}
+            for douban_id, user in user_dict.items():
+                if user.limit == 0:
+                    logger.info("用户 %s(%s) 每日限额为0，跳过处理", user.username, douban_id)
                     continue
-                
+                if not self.__can_process_today(daily_stats, today, user):
+                    logger.info("用户 %s(%s) 今日已达限额 %s 部，跳过处理", user.username, douban_id, user.limit)
+                    continue
+                active_users[douban_id] = user
+            
+            # 并发获取所有用户的RSS数据
+            feeds = self.__fetch_user_feeds(list(active_users))
+            
+            # 循环内频繁访问的属性绑定为局部变量
+            get_no_exists_info = self.__get_no_exists_info
+            movie_type = MediaType.MOVIE
+            # 搜索下载使用的订阅站点及优先级规则组，整个同步过程中只读取一次
+            if self._search_download:
+                rss_sites = self.systemconfig.get(SystemConfigKey.RssSites)
+                rule_groups = self.systemconfig.get(SystemConfigKey.SubscribeFilterRuleGroups)
+            else:
+                rss_sites = rule_groups = None
+            
+            for douban_id, user in active_users.items():
+                username = user.username
                 # 同步每个用户的豆瓣数据
-                logger.info(f"开始同步用户 {username}({douban_id}) 的豆瓣想看数据 ...")
-                
-                # 添加请求间隔
-                if total_processed > 0 or total_skipped > 0:
-                    logger.info(f"等待 {self._request_interval} 秒后请求下一个用户...")
-                    time.sleep(self._request_interval)
+                logger.info("开始同步用户 %s(%s) 的豆瓣想看数据 ...", username, douban_id)
                 
                 url = self._interests_url % douban_id
-                
-                # 使用重试机制获取RSS
-                results = self.__fetch_rss_with_retry(url)
+                # 取出后即从映射中移除，当前用户处理完后原始RSS数据即可释放
+                results = feeds.pop(douban_id, None)
                 
                 if not results:
-                    logger.warn(f"未获取到用户 {username}({douban_id}) 豆瓣RSS数据：{url}")
+                    logger.warn("未获取到用户 %s(%s) 豆瓣RSS数据：%s", username, douban_id, url)
                     total_errors += 1
                     continue
                 else:
-                    logger.info(f"获取到用户 {username}({douban_id}) 豆瓣RSS数据：{len(results)} 条")
+                    logger.info("获取到用户 %s(%s) 豆瓣RSS数据：%s 条", username, douban_id, len(results))
                 
-                # 解析数据
-                mediachain = MediaChain()
-                downloadchain = DownloadChain()
-                subscribechain = SubscribeChain()
-                searchchain = SearchChain()
-                subscribeoper = SubscribeOper()
+                # 同一条目重复出现时只处理一次
+                results = self.__unique_results(results)
                 
                 user_processed = 0  # 当前用户已处理数量
+                # 当前用户今日已处理数量只读取一次，循环内直接比较与累加
+                daily_limit = user.limit
+                user_daily = daily_stats.get(today, {}).get(username, 0)
+                user_errors: List[Tuple[str, str]] = []  # 当前用户处理出错的条目
+                # 开启汇总通知时暂存当前用户的通知：(摘要行, 海报)
+                notices: Optional[List[Tuple[str, Optional[str]]]] = [] if self._batch_notify else None
+                # 循环内不变的时间值只计算一次
+                pubdate_cutoff = datetime.datetime.now(datetime.timezone.utc) - days_window
+                now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                now_ts = int(time.time())
+                
+                # 先做无需网络请求的过滤，得到待处理条目，原始RSS条目不再保留
+                candidates, skipped = self.__prefilter(results, pubdate_cutoff, settled_ids, user_errors)
+                results = None
+                total_skipped += skipped
+                total_errors += len(user_errors)
                 
-                for result in results:
+                # 识别阶段按批并发执行，下载、订阅及历史记录仍按顺序逐条处理
+                batch_size = self._identify_batch
+                identified = []
+                for index, (doubanid_item, title) in enumerate(candidates):
+                    # 检查每日限额，先于任何网络请求，达到限额后不再识别后续批次
+                    if 0 < daily_limit <= user_daily:
+                        logger.info('用户 %s 今日已处理 %s/%s 部，已达限额，跳过后续处理', username, user_daily, daily_limit)
+                        break  # 跳出当前用户的循环
+                    if index % batch_size == 0:
+                        identified = self.__identify_batch(mediachain, candidates[index:index + batch_size])
                     try:
-                        dtype = result.get("title", "")[:2]
-                        title = result.get("title", "")[2:]
-                        # 增加豆瓣昵称，数据来源自app.helper.rss.py
-                        nickname = result.get("nickname", "")
-                        if nickname:
-                            nickname = f"[{nickname}]"
-                        if dtype not in ["想看"]:
-                            logger.info(f'标题：{title}，非想看数据，跳过')
-                            total_skipped += 1
-                            continue
-                        if not result.get("link"):
-                            logger.warn(f'标题：{title}，未获取到链接，跳过')
-                            total_skipped += 1
-                            continue
+                        # 识别媒体信息（已在识别阶段并发完成），历史记录复查与新条目共用同一识别结果
+                        meta, mediainfo = identified[index % batch_size].result()
                         
-                        # 判断是否在天数范围
-                        pubdate: Optional[datetime.datetime] = result.get("pubdate")
-                        if pubdate:
-                            if (datetime.datetime.now(datetime.timezone.utc) - pubdate).days > float(self._days):
-                                logger.info(f'已超过同步天数，标题：{title}，发布时间：{pubdate}')
-                                total_skipped += 1
-                                continue
-                        
-                        doubanid_item = result.get("link", "").split("/")[-2]
-                        
-                        # 检查是否处理过
-                        if not doubanid_item:
-                            continue
-                            
-                        # 如果历史记录中存在,需要进一步检查媒体库是否真的存在
-                        if doubanid_item in [h.get("doubanid") for h in history]:
-                            logger.info(f'标题:{title},豆瓣ID:{doubanid_item} 历史记录中已存在,检查媒体库状态...')
-                            # 先识别媒体信息
-                            meta_check = MetaInfo(title=title)
-                            douban_info_check = self.chain.douban_info(doubanid=doubanid_item)
-                            meta_check.type = MediaType.MOVIE if douban_info_check.get("type") == "movie" else MediaType.TV
-                            
-                            if settings.RECOGNIZE_SOURCE == "themoviedb":
-                                tmdbinfo_check = mediachain.get_tmdbinfo_by_doubanid(doubanid=doubanid_item, mtype=meta_check.type)
-                                if tmdbinfo_check:
-                                    mediainfo_check = self.chain.recognize_media(meta=meta_check, tmdbid=tmdbinfo_check.get("id"))
-                                else:
-                                    mediainfo_check = None
-                            else:
-                                mediainfo_check = self.chain.recognize_media(meta=meta_check, doubanid=doubanid_item)
-                            
+                        # 如果历史记录中存在,需要进一步检查媒体库是否真的存在，历史记录按豆瓣ID索引，O(1)查找
+                        existing = history.get(doubanid_item)
+                        if existing:
+                            logger.info('标题:%s,豆瓣ID:%s 历史记录中已存在(%s于%s),检查媒体库状态...', title, doubanid_item,
+                                        _ACTION_MAP.get(existing.action, existing.action), existing.time)
                             # 如果能识别到媒体信息,检查是否在媒体库中存在
-                            if mediainfo_check:
-                                exist_flag_check, _ = downloadchain.get_no_exists_info(meta=meta_check, mediainfo=mediainfo_check)
+                            if mediainfo:
+                                exist_flag_check, _ = get_no_exists_info(downloadchain, meta, mediainfo)
                                 if exist_flag_check:
-                                    logger.info(f'标题:{title},豆瓣ID:{doubanid_item} 已处理过且媒体库中存在,跳过')
+                                    logger.info('标题:%s,豆瓣ID:%s 已处理过且媒体库中存在,跳过', title, doubanid_item)
+                                    settled_ids.add(doubanid_item)
                                     total_skipped += 1
                                     continue
                                 else:
-                                    logger.info(f'标题:{title},豆瓣ID:{doubanid_item} 已处理过但媒体库中不存在,重新处理')
+                                    logger.info('标题:%s,豆瓣ID:%s 已处理过但媒体库中不存在,重新处理', title, doubanid_item)
                                     # 从历史记录中删除该条记录,以便重新处理
-                                    history = [h for h in history if h.get("doubanid") != doubanid_item]
+                                    history.remove(doubanid_item)
                             else:
-                                logger.info(f'标题:{title},豆瓣ID:{doubanid_item} 无法识别媒体信息,跳过')
+                                logger.info('标题:%s,豆瓣ID:%s 无法识别媒体信息,跳过', title, doubanid_item)
+                                settled_ids.add(doubanid_item)
                                 total_skipped += 1
                                 continue
 
-                        # 检查每日限额
-                        if not self.__can_process_today(username, daily_limit):
-                            logger.info(f'用户 {username} 今日已达限额，跳过后续处理')
-                            break  # 跳出当前用户的循环
-
-                        # 识别媒体信息
-                        meta = MetaInfo(title=title)
-                        douban_info = self.chain.douban_info(doubanid=doubanid_item)
-                        meta.type = MediaType.MOVIE if douban_info.get("type") == "movie" else MediaType.TV
-                        if settings.RECOGNIZE_SOURCE == "themoviedb":
-                            tmdbinfo = mediachain.get_tmdbinfo_by_doubanid(doubanid=doubanid_item, mtype=meta.type)
-                            if not tmdbinfo:
-                                logger.warn(f'未能通过豆瓣ID {doubanid_item} 获取到TMDB信息，标题：{title}，豆瓣ID：{doubanid_item}，尝试回退豆瓣识别')
-                                mediainfo = self.chain.recognize_media(meta=meta, doubanid=doubanid_item)
-                                if not mediainfo:
-                                    logger.warn(f'回退豆瓣识别失败，豆瓣ID：{doubanid_item}')
-                                    total_errors += 1
-                                    continue
-                            else:
-                                mediainfo = self.chain.recognize_media(meta=meta, tmdbid=tmdbinfo.get("id"))
-                                if not mediainfo:
-                                    logger.warn(f'TMDBID {tmdbinfo.get("id")} 未识别到媒体信息，尝试回退豆瓣识别')
-                                    mediainfo = self.chain.recognize_media(meta=meta, doubanid=doubanid_item)
-                                    if not mediainfo:
-                                        logger.warn(f'回退豆瓣识别失败，豆瓣ID：{doubanid_item}')
-                                        total_errors += 1
-                                        continue
-                        else:
-                            mediainfo = self.chain.recognize_media(meta=meta, doubanid=doubanid_item)
-                            if not mediainfo:
-                                logger.warn(f'豆瓣ID {doubanid_item} 未识别到媒体信息')
-                                total_errors += 1
-                                continue
+                        if not mediainfo:
+                            total_errors += 1
+                            continue
+                        # 海报地址在通知与历史记录中共用
+                        poster = mediainfo.get_poster_image()
                         
                         # 查询缺失的媒体信息
-                        exist_flag, no_exists = downloadchain.get_no_exists_info(meta=meta, mediainfo=mediainfo)
+                        exist_flag, no_exists = get_no_exists_info(downloadchain, meta, mediainfo)
                         if exist_flag:
-                            logger.info(f'{mediainfo.title_year} 媒体库中已存在')
+                            logger.info('%s 媒体库中已存在', mediainfo.title_year)
                             action = "exist"
                             total_skipped += 1
                         else:
                             if self._search_download:
                                 # 先搜索资源
-                                logger.info(
-                                    f'{username} 的媒体库中不存在或不完整，开启搜索下载，开始搜索 {mediainfo.title_year} 的资源...')
+                                logger.info('%s 的媒体库中不存在或不完整，开启搜索下载，开始搜索 %s 的资源...',
+                                            username, mediainfo.title_year)
                                 # 按订阅优先级规则组搜索过滤，站点为设置的订阅站点
                                 filter_results = searchchain.process(
                                     mediainfo=mediainfo,
                                     no_exists=no_exists,
-                                    sites=self.systemconfig.get(SystemConfigKey.RssSites),
-                                    rule_groups=self.systemconfig.get(SystemConfigKey.SubscribeFilterRuleGroups)
+                                    sites=rss_sites,
+                                    rule_groups=rule_groups
                                 )
                                 if filter_results:
-                                    logger.info(f'找到符合条件的资源，开始为 {username} 下载 {mediainfo.title_year} ...')
+                                    logger.info('找到符合条件的资源，开始为 %s 下载 %s ...', username, mediainfo.title_year)
                                     action = "download"
-                                    if mediainfo.type == MediaType.MOVIE:
+                                    if mediainfo.type == movie_type:
                                         # 电影类型调用单次下载
                                         download_id = downloadchain.download_single(
                                             context=filter_results[0],
                                             username=username
                                         )
                                         if not download_id:
-                                            logger.info(f'下载失败，为 {username} 添加订阅 {mediainfo.title_year} ...')
+                                            logger.info('下载失败，为 %s 添加订阅 %s ...', username, mediainfo.title_year)
                                             self.add_subscribe(mediainfo, meta, username)
                                             action = "subscribe"
                                         else:
                                             # 发送下载通知
                                             if self._notify:
-                                                self.post_message(
-                                                    mtype=NotificationType.Plugin,
+                                                self.__notify_item(
+                                                    notices,
+                                                    line=f"{mediainfo.title_year}：已开始下载",
                                                     title=f"{username} 想看{mediainfo.type.value} {mediainfo.title_year}，已开始下载，等待入库。",
                                                     text=f"来自豆瓣还想看同步",
-                                                    image=mediainfo.get_poster_image()
+                                                    image=poster
                                                 )
                                     else:
                                         # 电视剧类型调用批量下载
@@ -935,12 +1427,12 @@ class DoubanHaixiangkan(_PluginBase):
                                             username=username
                                         )
                                         if no_exists:
-                                            logger.info(f'下载失败或未下载完所有剧集，为 {username} 添加订阅 {mediainfo.title_year} ...')
+                                            logger.info('下载失败或未下载完所有剧集，为 %s 添加订阅 %s ...', username, mediainfo.title_year)
                                             sub_id, message = self.add_subscribe(mediainfo, meta, username)
                                             action = "subscribe"
 
                                             # 更新订阅信息
-                                            logger.info(f'根据缺失剧集更新订阅信息 {mediainfo.title_year} ...')
+                                            logger.info('根据缺失剧集更新订阅信息 %s ...', mediainfo.title_year)
                                             subscribe = subscribeoper.get(sub_id)
                                             if subscribe:
                                                 subscribechain.finish_subscribe_or_not(subscribe=subscribe,
@@ -951,66 +1443,109 @@ class DoubanHaixiangkan(_PluginBase):
                                         else:
                                             # 发送下载通知
                                             if self._notify:
-                                                self.post_message(
-                                                    mtype=NotificationType.Plugin,
+                                                self.__notify_item(
+                                                    notices,
+                                                    line=f"{mediainfo.title_year}：已开始下载",
                                                     title=f"{username} 想看{mediainfo.type.value} {mediainfo.title_year}，开始下载，等待入库。",
                                                     text=f"来自豆瓣还想看同步",
-                                                    image=mediainfo.get_poster_image()
+                                                    image=poster
                                                 )
 
                                 else:
-                                    logger.info(f'未找到符合条件资源，为 {username} 添加订阅 {mediainfo.title_year} ...')
+                                    logger.info('未找到符合条件资源，为 %s 添加订阅 %s ...', username, mediainfo.title_year)
                                     self.add_subscribe(mediainfo, meta, username)
                                     action = "subscribe"
                             else:
-                                logger.info(f'{username} 的媒体库中不存在或不完整，未开启搜索下载，添加订阅 {mediainfo.title_year} ...')
+                                logger.info('%s 的媒体库中不存在或不完整，未开启搜索下载，添加订阅 %s ...', username, mediainfo.title_year)
                                 self.add_subscribe(mediainfo, meta, username)
                                 action = "subscribe"
                             
                             # 发送订阅通知
                             if action == "subscribe" and self._notify:
-                                self.post_message(
-                                    mtype=NotificationType.Plugin,
+                                self.__notify_item(
+                                    notices,
+                                    line=f"{mediainfo.title_year}：已订阅",
                                     title=f"{username} 订阅了 {mediainfo.type.value} {mediainfo.title_year} ，但未搜索到资源，一旦搜索到资源我们会尽快入库",
-                                    text=f"年份：{mediainfo.year}\n简介：{mediainfo.overview[:100] if mediainfo.overview else '暂无'}",
-                                    image=mediainfo.get_poster_image()
+                                    text=f"年份：{mediainfo.year}\n简介：{(mediainfo.overview or '暂无')[:100]}",
+                                    image=poster
                                 )
                             
                             total_processed += 1
                             user_processed += 1
-                            # 成功处理后更新每日计数
-                            self.__increment_daily_count(username, daily_limit)
+                            # 成功处理后更新每日计数，同步写回统计数据以便中途落盘
+                            if daily_limit > 0:
+                                user_daily += 1
+                                daily_stats.setdefault(today, {})[username] = user_daily
+                                stats_dirty = True
+                                logger.info("用户 %s 今日已处理 %s/%s 部", username, user_daily, daily_limit)
                         
                         # 存储历史记录
-                        history.append({
-                            "action": action,
-                            "title": title,
-                            "type": mediainfo.type.value,
-                            "year": mediainfo.year,
-                            "poster": mediainfo.get_poster_image(),
-                            "overview": mediainfo.overview,
-                            "tmdbid": mediainfo.tmdb_id,
-                            "doubanid": doubanid_item,
-                            "subscriber": username,
-                            "time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        })
+                        history.add(HistoryEntry(
+                            action=action,
+                            title=title,
+                            type=mediainfo.type.value,
+                            year=mediainfo.year,
+                            poster=poster,
+                            overview=mediainfo.overview,
+                            tmdbid=mediainfo.tmdb_id,
+                            doubanid=doubanid_item,
+                            subscriber=username,
+                            time=now_str,
+                            time_ts=now_ts
+                        ))
+                        # 定量中途落盘，异常中断时不丢失已处理的记录及每日计数
+                        if history.pending_count >= self._flush_batch:
+                            history.flush()
+                            if stats_dirty:
+                                self.__save_daily_stats(daily_stats)
+                                stats_dirty = False
                     except Exception as err:
-                        logger.error(f'同步用户 {username}({douban_id}) 豆瓣想看数据出错：{str(err)}')
+                        # 汇总后统一输出，避免豆瓣接口异常时逐条刷屏
+                        user_errors.append((title, str(err)))
                         total_errors += 1
                 
-                logger.info(f"用户 {username}({douban_id}) 豆瓣想看同步完成，本次处理: {user_processed} 部")
+                if notices:
+                    self.post_message(
+                        mtype=NotificationType.Plugin,
+                        title=f"{username} 的豆瓣想看本次同步了 {len(notices)} 部",
+                        text="\n".join(line for line, _ in notices),
+                        image=next((image for _, image in notices if image), None)
+                    )
+                
+                if user_errors:
+                    first_title, first_err = user_errors[0]
+                    logger.error('同步用户 %s(%s) 豆瓣想看数据出错 %s 条，首个错误：%s：%s',
+                                 username, douban_id, len(user_errors), first_title, first_err)
+                    for error_title, error in user_errors[1:]:
+                        logger.debug('同步出错：%s：%s', error_title, error)
+                
+                logger.info("用户 %s(%s) 豆瓣想看同步完成，本次处理: %s 部", username, douban_id, user_processed)
+            
+            # 保存每日统计
+            if stats_dirty:
+                self.__save_daily_stats(daily_stats)
             
-            # 保存历史记录
-            self.save_data('history', history)
+            # 有变更时才写入历史记录，无新增的定时同步不产生任何IO
+            if history.dirty:
+                history.flush()
             # 缓存只清理一次
             self._clearflag = False
             
             # 输出总体统计
-            logger.info(f"本次同步完成 - 处理: {total_processed} 部, 跳过: {total_skipped} 部, 错误: {total_errors} 部")
+            logger.info("本次同步完成 - 处理: %s 部, 跳过: %s 部, 错误: %s 部", total_processed, total_skipped, total_errors)
+            return True
+        finally:
+            # 无论同步是否出错都释放本次同步的缓存
+            self._run_cache = {}
+            lock.release()
 
-    @staticmethod
-    def add_subscribe(mediainfo, meta, username):
-        return SubscribeChain().add(
+    def add_subscribe(self, mediainfo: MediaInfo, meta: MetaBase, username: str):
+        """
+        添加订阅，使用插件生命周期内复用的订阅链
+        """
+        if not self._subscribe_chain:
+            self._subscribe_chain = _get_chains()[2]
+        return self._subscribe_chain.add(
             title=mediainfo.title,
             year=mediainfo.year,
             mtype=mediainfo.type,
@@ -1030,14 +1565,30 @@ class DoubanHaixiangkan(_PluginBase):
             if not event_data or event_data.get("action") != "douban_sync":
                 return
 
+            if lock.locked():
+                self.post_message(mtype=NotificationType.Plugin,
+                                  channel=event_data.get("channel"),
+                                  title="豆瓣想看同步正在执行中，请稍后再试",
+                                  userid=event_data.get("user"))
+                return
+
             logger.info("收到命令，开始执行豆瓣想看同步 ...")
             self.post_message(mtype=NotificationType.Plugin,
-                              channel=event.event_data.get("channel"),
+                              channel=event_data.get("channel"),
                               title="开始同步豆瓣想看 ...",
-                              userid=event.event_data.get("user"))
-        self.sync()
+                              userid=event_data.get("user"))
+        # 在后台线程中同步，不阻塞事件处理
+        Thread(target=self.__run_remote_sync, args=(event,), daemon=True).start()
+
+    def __run_remote_sync(self, event: Optional[Event]):
+        """
+        执行远程命令触发的同步，完成后发送通知
+        """
+        # 检查锁与后台线程获取锁之间可能有定时同步抢先执行，以实际执行结果为准
+        synced = self.sync()
 
         if event:
             self.post_message(mtype=NotificationType.Plugin,
                               channel=event.event_data.get("channel"),
-                              title="同步豆瓣想看数据完成！", userid=event.event_data.get("user"))
+                              title="同步豆瓣想看数据完成！" if synced else "豆瓣想看同步正在执行中，请稍后再试",
+                              userid=event.event_data.get("user"))
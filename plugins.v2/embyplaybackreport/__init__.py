@@ -1,17 +1,600 @@
+import hashlib
 import json
-import threading
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, List, Dict, Tuple, Optional
-
-import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
+from functools import lru_cache
+from threading import Lock
+from typing import Any, List, Dict, Tuple, Optional, TYPE_CHECKING
 
 from app.core.config import settings
 from app.plugins import _PluginBase
 from app.log import logger
 from app.schemas.types import NotificationType
-import requests
+
+# 调度器与HTTP库仅在插件启用时才导入,未启用时不增加启动开销
+if TYPE_CHECKING:
+    import requests
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.cron import CronTrigger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# 报告类型选项
+_REPORT_OPTIONS = [
+    {'title': '📊 总播放时长', 'value': 'total_duration'},
+    {'title': '▶️ 总观看次数', 'value': 'total_count'},
+    {'title': '📺 内容类型排行', 'value': 'type_ranking'},
+    {'title': '👥 活跃用户排行TOP5', 'value': 'user_ranking'},
+    {'title': '🔥 热门媒体榜单TOP10', 'value': 'hot_media'},
+    {'title': '📱 最受欢迎客户端', 'value': 'popular_client'},
+    {'title': '🆕 新增媒体统计', 'value': 'new_media'},
+    {'title': '❄️ 冷门媒体提醒(>30天无观看)', 'value': 'cold_media'},
+    {'title': '⚠️ 异常用户告警', 'value': 'abnormal_user'},
+    {'title': '📈 观影趋势分析', 'value': 'trend_analysis'},
+    {'title': '⏰ 观影时段分布', 'value': 'time_distribution'}
+]
+
+# 配置页面结构,内容固定,模块加载时构建一次
+_FORM_SCHEMA: List[dict] = [
+    {
+        'component': 'VForm',
+        'content': [
+            # 基础设置
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 4},
+                        'content': [
+                            {
+                                'component': 'VSwitch',
+                                'props': {
+                                    'model': 'enabled',
+                                    'label': '启用插件',
+                                }
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 4},
+                        'content': [
+                            {
+                                'component': 'VSwitch',
+                                'props': {
+                                    'model': 'notify',  # 添加通知开关
+                                    'label': '发送通知',
+                                }
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 4},
+                        'content': [
+                            {
+                                'component': 'VSwitch',
+                                'props': {
+                                    'model': 'onlyonce',
+                                    'label': '立即运行一次',
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 6},
+                        'content': [
+                            {
+                                'component': 'VTextField',
+                                'props': {
+                                    'model': 'emby_host',
+                                    'label': 'Emby服务器地址',
+                                    'placeholder': 'https://emby.example.com',
+                                    'hint': '只需填写主域名'
+                                }
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 6},
+                        'content': [
+                            {
+                                'component': 'VTextField',
+                                'props': {
+                                    'model': 'emby_token',
+                                    'label': 'Emby API Token',
+                                    'placeholder': '输入API密钥'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+
+            # 每日报告设置
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12},
+                        'content': [
+                            {
+                                'component': 'VAlert',
+                                'props': {
+                                    'type': 'info',
+                                    'variant': 'tonal',
+                                    'text': '📅 每日报告设置',
+                                    'style': 'margin-top: 12px;'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 3},
+                        'content': [
+                            {
+                                'component': 'VSwitch',
+                                'props': {
+                                    'model': 'daily_enabled',
+                                    'label': '启用每日报告',
+                                }
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 9},
+                        'content': [
+                            {
+                                'component': 'VCronField',
+                                'props': {
+                                    'model': 'daily_cron',
+                                    'label': '执行周期',
+                                    'placeholder': '默认每天9点执行'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12},
+                        'content': [
+                            {
+                                'component': 'VSelect',
+                                'props': {
+                                    'model': 'daily_reports',
+                                    'label': '报告内容',
+                                    'items': _REPORT_OPTIONS,
+                                    'multiple': True,
+                                    'chips': True,
+                                    'hint': '选择需要包含的报告内容'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+
+            # 每周报告设置
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12},
+                        'content': [
+                            {
+                                'component': 'VAlert',
+                                'props': {
+                                    'type': 'success',
+                                    'variant': 'tonal',
+                                    'text': '📊 每周报告设置',
+                                    'style': 'margin-top: 12px;'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 3},
+                        'content': [
+                            {
+                                'component': 'VSwitch',
+                                'props': {
+                                    'model': 'weekly_enabled',
+                                    'label': '启用每周报告',
+                                }
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 9},
+                        'content': [
+                            {
+                                'component': 'VCronField',
+                                'props': {
+                                    'model': 'weekly_cron',
+                                    'label': '执行周期',
+                                    'placeholder': '默认每周一9点执行'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12},
+                        'content': [
+                            {
+                                'component': 'VSelect',
+                                'props': {
+                                    'model': 'weekly_reports',
+                                    'label': '报告内容',
+                                    'items': _REPORT_OPTIONS,
+                                    'multiple': True,
+                                    'chips': True,
+                                    'hint': '选择需要包含的报告内容'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+
+            # 每月报告设置
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12},
+                        'content': [
+                            {
+                                'component': 'VAlert',
+                                'props': {
+                                    'type': 'warning',
+                                    'variant': 'tonal',
+                                    'text': '📈 每月报告设置',
+                                    'style': 'margin-top: 12px;'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 3},
+                        'content': [
+                            {
+                                'component': 'VSwitch',
+                                'props': {
+                                    'model': 'monthly_enabled',
+                                    'label': '启用每月报告',
+                                }
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12, 'md': 9},
+                        'content': [
+                            {
+                                'component': 'VCronField',
+                                'props': {
+                                    'model': 'monthly_cron',
+                                    'label': '执行周期',
+                                    'placeholder': '默认每月1号9点执行'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12},
+                        'content': [
+                            {
+                                'component': 'VSelect',
+                                'props': {
+                                    'model': 'monthly_reports',
+                                    'label': '报告内容',
+                                    'items': _REPORT_OPTIONS,
+                                    'multiple': True,
+                                    'chips': True,
+                                    'hint': '选择需要包含的报告内容'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            },
+
+            # 说明
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {'cols': 12},
+                        'content': [
+                            {
+                                'component': 'VAlert',
+                                'props': {
+                                    'type': 'info',
+                                    'variant': 'tonal',
+                                    'style': 'margin-top: 12px;',
+                                    'text': '💡 提示: 插件通过Emby的Playback Reporting插件统计数据。'
+                                            '异常用户检测基于播放行为分析,保护用户隐私,不记录IP地址。'
+                                            '已修复Cron星期字段解析问题(Cron的1=周一,0=周日)。'
+                                }
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
+    }
+]
+
+# 配置默认值
+_FORM_DEFAULTS: Dict[str, Any] = {
+    "enabled": False,
+    "notify": True,  # 默认开启通知
+    "onlyonce": False,
+    "emby_host": "",
+    "emby_token": "",
+    "daily_enabled": False,
+    "daily_cron": "0 9 * * *",
+    "daily_reports": ["total_duration", "total_count", "type_ranking"],
+    "weekly_enabled": False,
+    "weekly_cron": "0 9 * * 1",
+    "weekly_reports": ["total_duration", "total_count", "user_ranking", "hot_media"],
+    "monthly_enabled": False,
+    "monthly_cron": "0 9 1 * *",
+    "monthly_reports": ["total_duration", "total_count", "user_ranking", "hot_media", "new_media", "trend_analysis"]
+}
+
+
+def _json_body(obj: Any) -> bytes:
+    """
+    序列化请求体,优先使用orjson
+    """
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    """
+    直接从响应字节反序列化,不经过文本解码的中间字符串
+    """
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _to_int(value: Any) -> int:
+    """
+    将查询结果单元格转换为整数,空值或非法值记为0,不依赖异常处理
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if value.lstrip("-").isdigit():
+            return int(value)
+        return int(_to_float(value))
+    return 0
+
+
+def _to_float(value: Any) -> float:
+    """
+    将查询结果单元格转换为浮点数,空值或非法值记为0
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if value.lstrip("-").replace(".", "", 1).isdigit():
+            return float(value)
+    return 0.0
+
+
+# Cron 表达式:以空白分隔的五个字段
+_CRON_RE = re.compile(r'^(\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)$')
+# Cron 五个字段对应的 CronTrigger 参数名
+_CRON_FIELDS = ('minute', 'hour', 'day', 'month', 'day_of_week')
+# Cron 星期数字 -> APScheduler 星期数字
+_CRON_DOW_MAP = {'0': '6', '1': '0', '2': '1', '3': '2', '4': '3', '5': '4', '6': '5', '7': '6'}
+
+
+@lru_cache(maxsize=128)
+def _cron_to_trigger(cron_str: str, tz: str) -> "CronTrigger":
+    """
+    解析 Cron 表达式并构建 CronTrigger,按 (表达式, 时区) 缓存
+    CronTrigger 不保存运行状态,可在多个任务及多次重新配置间共享
+    """
+    from apscheduler.triggers.cron import CronTrigger
+
+    match = _CRON_RE.match(cron_str)
+    if not match:
+        raise ValueError("Cron表达式应包含5个字段")
+    parts = match.groups()
+
+    # 构建 CronTrigger 参数,'*' 字段不传
+    trigger_args = {name: value for name, value in zip(_CRON_FIELDS, parts) if value != '*'}
+    # 星期几: Cron的0/7=周日,1-6=周一至周六;APScheduler的0-6=周一至周日
+    if 'day_of_week' in trigger_args:
+        trigger_args['day_of_week'] = _CRON_DOW_MAP.get(trigger_args['day_of_week'], trigger_args['day_of_week'])
+    trigger_args['timezone'] = tz
+
+    return CronTrigger(**trigger_args)
+
+
+# 统计查询模板,{start}/{end} 为统计区间边界
+_SQL_TOTAL_DURATION = """
+SELECT SUM(PlayDuration) as total_duration
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+"""
+
+_SQL_TOTAL_COUNT = """
+SELECT COUNT(*) as total_count
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+"""
+
+_SQL_TOTALS = """
+SELECT SUM(PlayDuration) as total_duration, COUNT(*) as total_count
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+"""
+
+_SQL_TYPE_RANKING = """
+SELECT ItemType, COUNT(*) as count, SUM(PlayDuration) as duration
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+GROUP BY ItemType
+ORDER BY count DESC
+LIMIT 5
+"""
+
+_SQL_USER_RANKING = """
+SELECT UserName, COUNT(*) as play_count, SUM(PlayDuration) as total_duration
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+GROUP BY UserName
+ORDER BY total_duration DESC
+LIMIT 5
+"""
+
+_SQL_HOT_MEDIA = """
+SELECT ItemName, ItemType, COUNT(DISTINCT UserId) as user_count,
+       COUNT(*) as play_count, SUM(PlayDuration) as duration
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+GROUP BY ItemName, ItemType
+ORDER BY user_count DESC, play_count DESC
+LIMIT 10
+"""
+
+_SQL_POPULAR_CLIENT = """
+SELECT ClientName, COUNT(*) as count
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+GROUP BY ClientName
+ORDER BY count DESC
+LIMIT 5
+"""
+
+_SQL_NEW_MEDIA = """
+SELECT ItemType, COUNT(DISTINCT ItemName) as new_count
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+GROUP BY ItemType
+"""
+
+_SQL_COLD_MEDIA = """
+SELECT ItemName, ItemType, MAX(DateCreated) as last_play
+FROM PlaybackActivity
+WHERE DateCreated < '{before}'
+GROUP BY ItemName, ItemType
+ORDER BY last_play ASC
+LIMIT 10
+"""
+
+_SQL_ABNORMAL_USERS = """
+SELECT UserName, COUNT(*) as play_count,
+       COUNT(DISTINCT DATE(DateCreated)) as active_days
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+GROUP BY UserName
+HAVING play_count > 100
+ORDER BY play_count DESC
+LIMIT 500
+"""
+
+_SQL_TREND_ANALYSIS = """
+SELECT DATE(DateCreated) as play_date,
+       COUNT(*) as play_count,
+       SUM(PlayDuration) as duration
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+GROUP BY DATE(DateCreated)
+ORDER BY play_date DESC
+"""
+
+_SQL_TIME_DISTRIBUTION = """
+SELECT
+    CASE
+        WHEN CAST(strftime('%H', DateCreated) AS INTEGER) BETWEEN 0 AND 5 THEN '凌晨(00-06)'
+        WHEN CAST(strftime('%H', DateCreated) AS INTEGER) BETWEEN 6 AND 11 THEN '上午(06-12)'
+        WHEN CAST(strftime('%H', DateCreated) AS INTEGER) BETWEEN 12 AND 17 THEN '下午(12-18)'
+        ELSE '晚间(18-24)'
+    END as time_period,
+    COUNT(*) as count
+FROM PlaybackActivity
+WHERE DateCreated >= '{start}'
+AND DateCreated <= '{end}'
+GROUP BY time_period
+ORDER BY count DESC
+"""
 
 
 class EmbyPlaybackReport(_PluginBase):
@@ -56,55 +639,47 @@ class EmbyPlaybackReport(_PluginBase):
     _monthly_cron = None
     _monthly_reports = []
     
-    _scheduler: Optional[BackgroundScheduler] = None
+    _scheduler: Optional["BackgroundScheduler"] = None
+    # 报告生成线程池,避免慢查询阻塞调度线程
+    _executor: Optional[ThreadPoolExecutor] = None
+    # 各报告共用的分项查询线程池,线程数与会话连接池大小一致,限制对Emby的总并发
+    _section_executor: Optional[ThreadPoolExecutor] = None
+    _MAX_CONNECTIONS = 8
+    # 复用的 HTTP 会话(keep-alive)
+    _session: Optional["requests.Session"] = None
+    # 报告文本缓存 {"类型|开始|结束|内容项": [报告文本, 生成时间戳]}
+    _report_cache: Dict[str, list] = {}
+    # 缓存对应的 Emby 服务器指纹,地址或Token变化时缓存失效
+    _cache_source: str = ""
+    # 查询结果缓存 {SQL: (查询时间戳, 结果)},用于短时间内重复的相同查询
+    _QUERY_CACHE_TTL = 60
+    _QUERY_CACHE_SIZE = 32
+    _query_cache: Dict[str, Tuple[float, Dict]] = {}
+    _query_lock = Lock()
+    # 重复推送判定窗口(秒)
+    _DUPLICATE_WINDOW = {"daily": 3600, "weekly": 21600, "monthly": 86400}
+    # 各类型报告最近一次成功推送 {报告类型: (统计开始日期, 时间戳)}
+    _last_runs: Dict[str, Tuple[str, float]] = {}
 
-    def _parse_cron_to_trigger(self, cron_str: str, report_type: str) -> Optional[CronTrigger]:
+    @staticmethod
+    def __get_timezone():
+        """获取时区对象,优先使用标准库 zoneinfo(自带实例缓存)"""
+        try:
+            from zoneinfo import ZoneInfo
+            return ZoneInfo(settings.TZ)
+        except (ImportError, KeyError):
+            # 无 zoneinfo 或系统缺少 tzdata(ZoneInfoNotFoundError 为 KeyError 子类)时使用 pytz
+            import pytz
+            return pytz.timezone(settings.TZ)
+
+    def _parse_cron_to_trigger(self, cron_str: str, report_type: str) -> Optional["CronTrigger"]:
         """
         将 Cron 表达式转换为 CronTrigger,使用明确的参数避免歧义
         """
         try:
-            parts = cron_str.strip().split()
-            if len(parts) != 5:
-                logger.error(f"{report_type} Cron表达式格式错误: {cron_str}")
-                return None
-            
-            minute, hour, day, month, day_of_week = parts
-            
-            # 构建 CronTrigger 参数
-            trigger_args = {
-                'timezone': settings.TZ
-            }
-            
-            # 处理分钟
-            if minute != '*':
-                trigger_args['minute'] = minute
-            
-            # 处理小时
-            if hour != '*':
-                trigger_args['hour'] = hour
-            
-            # 处理日期(每月几号)
-            if day != '*':
-                trigger_args['day'] = day
-            
-            # 处理月份
-            if month != '*':
-                trigger_args['month'] = month
-            
-            # 处理星期几
-            if day_of_week != '*':
-                try:
-                    dow_num = int(day_of_week)
-                    if dow_num == 0:  # Cron的周日
-                        trigger_args['day_of_week'] = 6  # APScheduler的周日
-                    else:  # Cron的1-6 对应 APScheduler的0-5
-                        trigger_args['day_of_week'] = dow_num - 1
-                except ValueError:
-                    trigger_args['day_of_week'] = day_of_week
-            
-            logger.info(f"{report_type}报告 Cron解析: {cron_str} -> {trigger_args}")
-            return CronTrigger(**trigger_args)
-            
+            trigger = _cron_to_trigger(cron_str.strip(), settings.TZ)
+            logger.info(f"{report_type}报告 Cron解析: {cron_str} -> {trigger}")
+            return trigger
         except Exception as e:
             logger.error(f"{report_type}报告 Cron解析失败: {cron_str}, 错误: {e}")
             return None
@@ -133,19 +708,57 @@ class EmbyPlaybackReport(_PluginBase):
             self._monthly_cron = config.get("monthly_cron", "0 9 1 * *")
             self._monthly_reports = config.get("monthly_reports", [])
 
-        # 停止现有任务
-        self.stop_service()
+        # 清空现有任务,调度器与线程池在重新配置时复用
+        if self._scheduler:
+            self._scheduler.remove_all_jobs()
+        # Token未变化时保留会话及其已建立的连接
+        if self._session and self._session.headers.get("X-Emby-Token") != self._emby_token:
+            self._session.close()
+            self._session = None
+
+        # 载入持久化的报告缓存,服务器变化时丢弃
+        self._cache_source = hashlib.md5(f"{self._emby_host}|{self._emby_token}".encode()).hexdigest()
+        cached = self.get_data("report_cache") or {}
+        if cached.get("source") == self._cache_source:
+            self._report_cache = cached.get("items") or {}
+        else:
+            self._report_cache = {}
+        self._last_runs = {}
+        with self._query_lock:
+            self._query_cache = {}
 
         if self._enabled or self._onlyonce:
+            from apscheduler.executors.pool import ThreadPoolExecutor as JobPoolExecutor
+            from apscheduler.schedulers.background import BackgroundScheduler
+
+            # 建立复用连接的会话,同一次报告的多个查询共用 TCP/TLS 连接
+            if self._emby_host and self._emby_token and not self._session:
+                self._session = self.__build_session()
+
             # 定时服务
-            self._scheduler = BackgroundScheduler(timezone=settings.TZ)
+            tz = self.__get_timezone()
+            if not self._scheduler:
+                # 任务只负责把报告提交到线程池,调度器自身只需很小的线程池
+                self._scheduler = BackgroundScheduler(
+                    timezone=tz,
+                    executors={"default": JobPoolExecutor(2)},
+                    job_defaults={"max_instances": 2, "coalesce": True, "misfire_grace_time": 1800}
+                )
+            if not self._executor:
+                # 每日/每周/每月报告可同时生成,互不阻塞
+                self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="emby-report")
+            if not self._section_executor:
+                self._section_executor = ThreadPoolExecutor(max_workers=self._MAX_CONNECTIONS,
+                                                            thread_name_prefix="emby-section")
 
             if self._onlyonce:
                 logger.info("Emby观影报告服务启动,立即运行一次")
                 self._scheduler.add_job(
                     func=self.run_all_reports,
                     trigger='date',
-                    run_date=datetime.now(tz=pytz.timezone(settings.TZ)) + timedelta(seconds=3),
+                    run_date=datetime.now(tz=tz) + timedelta(seconds=3),
+                    id="emby_playback_report_once",
+                    replace_existing=True,
                     name="Emby观影报告-立即执行"
                 )
                 # 关闭一次性开关
@@ -153,55 +766,38 @@ class EmbyPlaybackReport(_PluginBase):
                 self._save_config()
 
             if self._enabled:
-                # 添加每日报告任务
-                if self._daily_enabled and self._daily_cron:
-                    trigger = self._parse_cron_to_trigger(self._daily_cron, "每日")
-                    if trigger:
-                        try:
-                            self._scheduler.add_job(
-                                func=self.report,
-                                trigger=trigger,
-                                args=["daily"],
-                                name="Emby观影报告-每日"
-                            )
-                            logger.info(f"每日报告任务已添加: {self._daily_cron}")
-                        except Exception as err:
-                            logger.error(f"每日报告任务添加失败: {err}")
-
-                # 添加每周报告任务
-                if self._weekly_enabled and self._weekly_cron:
-                    trigger = self._parse_cron_to_trigger(self._weekly_cron, "每周")
-                    if trigger:
-                        try:
-                            self._scheduler.add_job(
-                                func=self.report,
-                                trigger=trigger,
-                                args=["weekly"],
-                                name="Emby观影报告-每周"
-                            )
-                            logger.info(f"每周报告任务已添加: {self._weekly_cron}")
-                        except Exception as err:
-                            logger.error(f"每周报告任务添加失败: {err}")
-
-                # 添加每月报告任务
-                if self._monthly_enabled and self._monthly_cron:
-                    trigger = self._parse_cron_to_trigger(self._monthly_cron, "每月")
-                    if trigger:
-                        try:
-                            self._scheduler.add_job(
-                                func=self.report,
-                                trigger=trigger,
-                                args=["monthly"],
-                                name="Emby观影报告-每月"
-                            )
-                            logger.info(f"每月报告任务已添加: {self._monthly_cron}")
-                        except Exception as err:
-                            logger.error(f"每月报告任务添加失败: {err}")
+                # 添加每日/每周/每月报告任务
+                for enabled, cron, label, report_type in (
+                        (self._daily_enabled, self._daily_cron, "每日", "daily"),
+                        (self._weekly_enabled, self._weekly_cron, "每周", "weekly"),
+                        (self._monthly_enabled, self._monthly_cron, "每月", "monthly")
+                ):
+                    if not enabled or not cron:
+                        continue
+                    trigger = self._parse_cron_to_trigger(cron, label)
+                    if not trigger:
+                        continue
+                    try:
+                        self._scheduler.add_job(
+                            func=self._schedule_report,
+                            trigger=trigger,
+                            args=[report_type],
+                            id=f"emby_playback_report_{report_type}",
+                            replace_existing=True,
+                            name=f"Emby观影报告-{label}"
+                        )
+                        logger.info(f"{label}报告任务已添加: {cron}")
+                    except Exception as err:
+                        logger.error(f"{label}报告任务添加失败: {err}")
 
             if self._scheduler.get_jobs():
                 # 启动服务
                 self._scheduler.print_jobs()
-                self._scheduler.start()
+                if not self._scheduler.running:
+                    self._scheduler.start()
+        else:
+            # 插件已停用,释放调度器与线程池
+            self.stop_service()
 
     def _save_config(self):
         """保存配置"""
@@ -237,374 +833,7 @@ class EmbyPlaybackReport(_PluginBase):
 
     def get_form(self) -> Tuple[List[dict], Dict[str, Any]]:
         """拼装插件配置页面"""
-        # 报告类型选项
-        report_options = [
-            {'title': '📊 总播放时长', 'value': 'total_duration'},
-            {'title': '▶️ 总观看次数', 'value': 'total_count'},
-            {'title': '📺 内容类型排行', 'value': 'type_ranking'},
-            {'title': '👥 活跃用户排行TOP5', 'value': 'user_ranking'},
-            {'title': '🔥 热门媒体榜单TOP10', 'value': 'hot_media'},
-            {'title': '📱 最受欢迎客户端', 'value': 'popular_client'},
-            {'title': '🆕 新增媒体统计', 'value': 'new_media'},
-            {'title': '❄️ 冷门媒体提醒(>30天无观看)', 'value': 'cold_media'},
-            {'title': '⚠️ 异常用户告警', 'value': 'abnormal_user'},
-            {'title': '📈 观影趋势分析', 'value': 'trend_analysis'},
-            {'title': '⏰ 观影时段分布', 'value': 'time_distribution'}
-        ]
-
-        return [
-            {
-                'component': 'VForm',
-                'content': [
-                    # 基础设置
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 4},
-                                'content': [
-                                    {
-                                        'component': 'VSwitch',
-                                        'props': {
-                                            'model': 'enabled',
-                                            'label': '启用插件',
-                                        }
-                                    }
-                                ]
-                            },
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 4},
-                                'content': [
-                                    {
-                                        'component': 'VSwitch',
-                                        'props': {
-                                            'model': 'notify',  # 添加通知开关
-                                            'label': '发送通知',
-                                        }
-                                    }
-                                ]
-                            },
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 4},
-                                'content': [
-                                    {
-                                        'component': 'VSwitch',
-                                        'props': {
-                                            'model': 'onlyonce',
-                                            'label': '立即运行一次',
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 6},
-                                'content': [
-                                    {
-                                        'component': 'VTextField',
-                                        'props': {
-                                            'model': 'emby_host',
-                                            'label': 'Emby服务器地址',
-                                            'placeholder': 'https://emby.example.com',
-                                            'hint': '只需填写主域名'
-                                        }
-                                    }
-                                ]
-                            },
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 6},
-                                'content': [
-                                    {
-                                        'component': 'VTextField',
-                                        'props': {
-                                            'model': 'emby_token',
-                                            'label': 'Emby API Token',
-                                            'placeholder': '输入API密钥'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    
-                    # 每日报告设置
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12},
-                                'content': [
-                                    {
-                                        'component': 'VAlert',
-                                        'props': {
-                                            'type': 'info',
-                                            'variant': 'tonal',
-                                            'text': '📅 每日报告设置',
-                                            'style': 'margin-top: 12px;'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 3},
-                                'content': [
-                                    {
-                                        'component': 'VSwitch',
-                                        'props': {
-                                            'model': 'daily_enabled',
-                                            'label': '启用每日报告',
-                                        }
-                                    }
-                                ]
-                            },
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 9},
-                                'content': [
-                                    {
-                                        'component': 'VCronField',
-                                        'props': {
-                                            'model': 'daily_cron',
-                                            'label': '执行周期',
-                                            'placeholder': '默认每天9点执行'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12},
-                                'content': [
-                                    {
-                                        'component': 'VSelect',
-                                        'props': {
-                                            'model': 'daily_reports',
-                                            'label': '报告内容',
-                                            'items': report_options,
-                                            'multiple': True,
-                                            'chips': True,
-                                            'hint': '选择需要包含的报告内容'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    
-                    # 每周报告设置
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12},
-                                'content': [
-                                    {
-                                        'component': 'VAlert',
-                                        'props': {
-                                            'type': 'success',
-                                            'variant': 'tonal',
-                                            'text': '📊 每周报告设置',
-                                            'style': 'margin-top: 12px;'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 3},
-                                'content': [
-                                    {
-                                        'component': 'VSwitch',
-                                        'props': {
-                                            'model': 'weekly_enabled',
-                                            'label': '启用每周报告',
-                                        }
-                                    }
-                                ]
-                            },
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 9},
-                                'content': [
-                                    {
-                                        'component': 'VCronField',
-                                        'props': {
-                                            'model': 'weekly_cron',
-                                            'label': '执行周期',
-                                            'placeholder': '默认每周一9点执行'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12},
-                                'content': [
-                                    {
-                                        'component': 'VSelect',
-                                        'props': {
-                                            'model': 'weekly_reports',
-                                            'label': '报告内容',
-                                            'items': report_options,
-                                            'multiple': True,
-                                            'chips': True,
-                                            'hint': '选择需要包含的报告内容'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    
-                    # 每月报告设置
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12},
-                                'content': [
-                                    {
-                                        'component': 'VAlert',
-                                        'props': {
-                                            'type': 'warning',
-                                            'variant': 'tonal',
-                                            'text': '📈 每月报告设置',
-                                            'style': 'margin-top: 12px;'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 3},
-                                'content': [
-                                    {
-                                        'component': 'VSwitch',
-                                        'props': {
-                                            'model': 'monthly_enabled',
-                                            'label': '启用每月报告',
-                                        }
-                                    }
-                                ]
-                            },
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12, 'md': 9},
-                                'content': [
-                                    {
-                                        'component': 'VCronField',
-                                        'props': {
-                                            'model': 'monthly_cron',
-                                            'label': '执行周期',
-                                            'placeholder': '默认每月1号9点执行'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12},
-                                'content': [
-                                    {
-                                        'component': 'VSelect',
-                                        'props': {
-                                            'model': 'monthly_reports',
-                                            'label': '报告内容',
-                                            'items': report_options,
-                                            'multiple': True,
-                                            'chips': True,
-                                            'hint': '选择需要包含的报告内容'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    },
-                    
-                    # 说明
-                    {
-                        'component': 'VRow',
-                        'content': [
-                            {
-                                'component': 'VCol',
-                                'props': {'cols': 12},
-                                'content': [
-                                    {
-                                        'component': 'VAlert',
-                                        'props': {
-                                            'type': 'info',
-                                            'variant': 'tonal',
-                                            'style': 'margin-top: 12px;',
-                                            'text': '💡 提示: 插件通过Emby的Playback Reporting插件统计数据。'
-                                                    '异常用户检测基于播放行为分析,保护用户隐私,不记录IP地址。'
-                                                    '已修复Cron星期字段解析问题(Cron的1=周一,0=周日)。'
-                                        }
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            }
-        ], {
-            "enabled": False,
-            "notify": True,  # 默认开启通知
-            "onlyonce": False,
-            "emby_host": "",
-            "emby_token": "",
-            "daily_enabled": False,
-            "daily_cron": "0 9 * * *",
-            "daily_reports": ["total_duration", "total_count", "type_ranking"],
-            "weekly_enabled": False,
-            "weekly_cron": "0 9 * * 1",
-            "weekly_reports": ["total_duration", "total_count", "user_ranking", "hot_media"],
-            "monthly_enabled": False,
-            "monthly_cron": "0 9 1 * *",
-            "monthly_reports": ["total_duration", "total_count", "user_ranking", "hot_media", "new_media", "trend_analysis"]
-        }
+        return _FORM_SCHEMA, _FORM_DEFAULTS
 
     def get_page(self) -> List[dict]:
         """拼装插件详情页面"""
@@ -614,24 +843,44 @@ class EmbyPlaybackReport(_PluginBase):
         """退出插件"""
         try:
             if self._scheduler:
-                self._scheduler.remove_all_jobs()
-                if self._scheduler.running:
-                    self._scheduler.shutdown()
-                self._scheduler = None
+                # shutdown 会一并丢弃任务,无需逐个移除
+                scheduler, self._scheduler = self._scheduler, None
+                if scheduler.running:
+                    scheduler.shutdown(wait=False)
+            if self._executor:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+            if self._section_executor:
+                self._section_executor.shutdown(wait=False, cancel_futures=True)
+                self._section_executor = None
+            if self._session:
+                self._session.close()
+                self._session = None
         except Exception as e:
             logger.error(f"退出插件失败: {str(e)}")
 
     def run_all_reports(self):
         """立即执行所有启用的报告"""
         if self._daily_enabled:
-            self.report("daily")
+            self._schedule_report("daily", force=True)
         if self._weekly_enabled:
-            self.report("weekly")
+            self._schedule_report("weekly", force=True)
         if self._monthly_enabled:
-            self.report("monthly")
+            self._schedule_report("monthly", force=True)
+
+    def _schedule_report(self, report_type: str, force: bool = False):
+        """将报告生成提交到线程池,调度线程立即返回"""
+        if self._executor:
+            self._executor.submit(self.report, report_type, force)
+        else:
+            self.report(report_type, force)
 
-    def report(self, report_type: str):
-        """生成并推送观影报告"""
+    def report(self, report_type: str, force: bool = False):
+        """
+        生成并推送观影报告
+        :param report_type: daily/weekly/monthly
+        :param force: 为True时不检查重复推送且不使用报告缓存(立即运行一次)
+        """
         if not self._emby_host or not self._emby_token:
             logger.error("Emby服务器地址或API Token未配置")
             return
@@ -659,17 +908,57 @@ class EmbyPlaybackReport(_PluginBase):
         try:
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
+            start_day = start_date.strftime('%Y-%m-%d')
+            end_day = end_date.strftime('%Y-%m-%d')
+
+            # 同一统计窗口短时间内重复触发(如Cron重复配置)时不再重复推送
+            last_run = self._last_runs.get(report_type)
+            if not force and last_run and last_run[0] == start_day \
+                    and time.time() - last_run[1] < self._DUPLICATE_WINDOW[report_type]:
+                logger.info(f"{period_text}报告在当前统计窗口内已推送,跳过重复执行")
+                return
+
+            # 同一统计窗口内重复触发时直接复用已生成的报告,立即运行时总是重新生成
+            cache_key = f"{report_type}|{start_day}|{end_day}|{','.join(report_items)}"
+            cache_ttl = min(3600, days * 86400 / 24)
+            cached = None if force else self._report_cache.get(cache_key)
+            if cached and time.time() - cached[1] < cache_ttl:
+                logger.info(f"{period_text}报告命中缓存,跳过Emby查询")
+                report_text = cached[0]
+            else:
+                # 生成报告内容
+                parts = [
+                    f"📅 {period_text}观影报告",
+                    f"统计周期: {start_day} ~ {end_day}",
+                    "=" * 40,
+                    ""
+                ]
+                header_size = len(parts)
+
+                # 根据配置生成各项报告,查询边界只格式化一次
+                start_bound = f"{start_day} 00:00:00"
+                end_bound = f"{end_day} 23:59:59"
+                # 总时长紧接总次数时合并为一次查询(输出顺序相同),否则按配置顺序分别查询
+                section_items = list(report_items)
+                for idx in range(len(section_items) - 1):
+                    if section_items[idx:idx + 2] == ["total_duration", "total_count"]:
+                        section_items[idx:idx + 2] = ["totals"]
+                        break
 
-            # 生成报告内容
-            report_text = f"📅 {period_text}观影报告\n"
-            report_text += f"统计周期: {start_date.strftime('%Y-%m-%d')} ~ {end_date.strftime('%Y-%m-%d')}\n"
-            report_text += "=" * 40 + "\n\n"
+                # 各部分查询互不依赖,在共用线程池中并发请求后按配置顺序拼接
+                mapper = self._section_executor.map if self._section_executor else map
+                sections = list(mapper(
+                    lambda item: self._generate_report_section(item, start_bound, end_bound, days),
+                    section_items
+                ))
+                parts.extend(section for section in sections if section)
+                has_section = len(parts) > header_size
+                parts.append("")
+                report_text = "\n".join(parts)
 
-            # 根据配置生成各项报告
-            for item in report_items:
-                section = self._generate_report_section(item, start_date, end_date, days)
-                if section:
-                    report_text += section + "\n"
+                # 仅缓存有实际数据的报告,避免把查询失败的空报告缓存下来
+                if has_section:
+                    self.__save_report_cache(cache_key, report_text)
 
             # 发送通知 (修改点：增加notify开关判断，并将类型修改为Plugin)
             if self._notify:
@@ -679,59 +968,100 @@ class EmbyPlaybackReport(_PluginBase):
                     text=report_text
                 )
             
+            self._last_runs[report_type] = (start_day, time.time())
             logger.info(f"{period_text}观影报告生成成功")
 
         except Exception as e:
             logger.error(f"生成{period_text}观影报告失败: {str(e)}")
 
-    def _generate_report_section(self, item_type: str, start: datetime, end: datetime, days: int) -> str:
-        """生成报告的各个部分"""
+    def __save_report_cache(self, key: str, text: str):
+        """写入报告缓存并清理过期条目"""
+        now = time.time()
+        self._report_cache = {
+            k: v for k, v in self._report_cache.items() if now - v[1] < 3600
+        }
+        self._report_cache[key] = [text, now]
+        self.save_data("report_cache", {
+            "source": self._cache_source,
+            "items": self._report_cache
+        })
+
+    def _generate_report_section(self, item_type: str, start: str, end: str, days: int) -> str:
+        """
+        生成报告的各个部分
+        :param start: 统计开始时间 YYYY-mm-dd HH:MM:SS
+        :param end: 统计结束时间 YYYY-mm-dd HH:MM:SS
+        """
+        handler = self._SECTION_HANDLERS.get(item_type)
+        if not handler:
+            return ""
         try:
-            if item_type == "total_duration":
-                return self._get_total_duration(start, end)
-            elif item_type == "total_count":
-                return self._get_total_count(start, end)
-            elif item_type == "type_ranking":
-                return self._get_type_ranking(start, end)
-            elif item_type == "user_ranking":
-                return self._get_user_ranking(start, end)
-            elif item_type == "hot_media":
-                return self._get_hot_media(start, end)
-            elif item_type == "popular_client":
-                return self._get_popular_client(start, end)
-            elif item_type == "new_media":
-                return self._get_new_media(start, end)
-            elif item_type == "cold_media":
-                return self._get_cold_media()
-            elif item_type == "abnormal_user":
-                return self._get_abnormal_users(start, end)
-            elif item_type == "trend_analysis":
-                return self._get_trend_analysis(start, end, days)
-            elif item_type == "time_distribution":
-                return self._get_time_distribution(start, end)
+            return handler(self, start, end, days)
         except Exception as e:
             logger.error(f"生成报告部分 {item_type} 失败: {str(e)}")
             return ""
 
+    def __build_session(self) -> "requests.Session":
+        """创建带连接池和有限重试的会话"""
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        session.headers.update({
+            "X-Emby-Token": self._emby_token,
+            "Content-Type": "application/json"
+        })
+        # 自定义查询为只读语句,POST 重试是安全的
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504],
+                      allowed_methods=frozenset({"POST"}))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self._MAX_CONNECTIONS, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
     def _query_emby(self, query: str) -> Optional[Dict]:
-        """查询Emby数据库"""
+        """查询Emby数据库,相同SQL在短时间内直接复用结果"""
+        now = time.time()
+        with self._query_lock:
+            cached = self._query_cache.get(query)
+            if cached and now - cached[0] < self._QUERY_CACHE_TTL:
+                return cached[1]
+
+        result = self.__request_emby(query)
+        if result is not None:
+            with self._query_lock:
+                self._query_cache.pop(query, None)
+                self._query_cache[query] = (now, result)
+                # 超出容量时淘汰最早写入的结果
+                while len(self._query_cache) > self._QUERY_CACHE_SIZE:
+                    self._query_cache.pop(next(iter(self._query_cache)))
+        return result
+
+    def __request_emby(self, query: str) -> Optional[Dict]:
+        """请求Emby自定义查询接口"""
         api_url = f"{self._emby_host.rstrip('/')}/emby/user_usage_stats/submit_custom_query"
         
         try:
-            headers = {
-                "X-Emby-Token": self._emby_token,
-                "Content-Type": "application/json"
-            }
+            if not self._session:
+                self._session = self.__build_session()
             
-            response = requests.post(
+            response = self._session.post(
                 api_url,
-                headers=headers,
-                json={"CustomQueryString": query},
-                timeout=30
+                data=_json_body({"CustomQueryString": query}),
+                timeout=(5, 30)
             )
             
             if response.status_code == 200:
-                return response.json()
+                logger.debug(f"Emby查询响应编码: {response.headers.get('Content-Encoding') or 'identity'}")
+                content = response.content
+                # 空响应体无法解析,按无结果处理
+                if not content:
+                    return {"results": []}
+                data = _json_loads(content)
+                if not data.get("results"):
+                    return {"results": []}
+                return data
             else:
                 logger.error(f"API请求失败: {response.status_code}")
                 return None
@@ -740,249 +1070,200 @@ class EmbyPlaybackReport(_PluginBase):
             logger.error(f"查询数据失败: {str(e)}")
             return None
 
-    def _get_total_duration(self, start: datetime, end: datetime) -> str:
+    def _get_totals(self, start: str, end: str, days: int) -> str:
+        """一次查询同时获取总播放时长和总观看次数"""
+        query = _SQL_TOTALS.format(start=start, end=end)
+        result = self._query_emby(query)
+        if result and result.get("results"):
+            row = result["results"][0]
+            hours = _to_float(row[0]) / 3600
+            count = _to_int(row[1])
+            return "\n".join([
+                f"⏱️ 总播放时长: {hours:.1f} 小时",
+                f"▶️ 总观看次数: {count} 次"
+            ])
+        return ""
+
+    def _get_total_duration(self, start: str, end: str, days: int) -> str:
         """获取总播放时长"""
-        query = f"""
-        SELECT SUM(PlayDuration) as total_duration
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        """
+        query = _SQL_TOTAL_DURATION.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
-            duration = float(result["results"][0][0] or 0)
+            duration = _to_float(result["results"][0][0])
             hours = duration / 3600
             return f"⏱️ 总播放时长: {hours:.1f} 小时"
         return ""
 
-    def _get_total_count(self, start: datetime, end: datetime) -> str:
+    def _get_total_count(self, start: str, end: str, days: int) -> str:
         """获取总观看次数"""
-        query = f"""
-        SELECT COUNT(*) as total_count
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        """
+        query = _SQL_TOTAL_COUNT.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
-            count = int(result["results"][0][0] or 0)
+            count = _to_int(result["results"][0][0])
             return f"▶️ 总观看次数: {count} 次"
         return ""
 
-    def _get_type_ranking(self, start: datetime, end: datetime) -> str:
+    def _get_type_ranking(self, start: str, end: str, days: int) -> str:
         """获取内容类型排行"""
-        query = f"""
-        SELECT ItemType, COUNT(*) as count, SUM(PlayDuration) as duration
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        GROUP BY ItemType
-        ORDER BY count DESC
-        """
+        query = _SQL_TYPE_RANKING.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
-            text = "📺 内容类型排行:\n"
-            for item in result["results"][:5]:
+            lines = ["📺 内容类型排行:"]
+            for item in result["results"]:
                 item_type = item[0] or "Unknown"
-                count = int(item[1] or 0)
-                duration = float(item[2] or 0) / 3600
-                text += f"  · {item_type}: {count}次 ({duration:.1f}小时)\n"
-            return text.rstrip()
+                count = _to_int(item[1])
+                duration = _to_float(item[2]) / 3600
+                lines.append(f"  · {item_type}: {count}次 ({duration:.1f}小时)")
+            return "\n".join(lines)
         return ""
 
-    def _get_user_ranking(self, start: datetime, end: datetime) -> str:
+    def _get_user_ranking(self, start: str, end: str, days: int) -> str:
         """获取活跃用户排行TOP5"""
-        query = f"""
-        SELECT UserName, COUNT(*) as play_count, SUM(PlayDuration) as total_duration
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        GROUP BY UserName
-        ORDER BY total_duration DESC
-        LIMIT 5
-        """
+        query = _SQL_USER_RANKING.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
-            text = "👥 活跃用户TOP5:\n"
+            lines = ["👥 活跃用户TOP5:"]
             for idx, item in enumerate(result["results"], 1):
                 username = item[0] or "Unknown"
-                play_count = int(item[1] or 0)
-                duration = float(item[2] or 0) / 3600
+                play_count = _to_int(item[1])
+                duration = _to_float(item[2]) / 3600
                 medal = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣"][idx-1]
-                text += f"  {medal} {username}: {play_count}次 ({duration:.1f}小时)\n"
-            return text.rstrip()
+                lines.append(f"  {medal} {username}: {play_count}次 ({duration:.1f}小时)")
+            return "\n".join(lines)
         return ""
 
-    def _get_hot_media(self, start: datetime, end: datetime) -> str:
+    def _get_hot_media(self, start: str, end: str, days: int) -> str:
         """获取热门媒体榜单TOP10"""
-        query = f"""
-        SELECT ItemName, ItemType, COUNT(DISTINCT UserId) as user_count, 
-               COUNT(*) as play_count, SUM(PlayDuration) as duration
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        GROUP BY ItemName, ItemType
-        ORDER BY user_count DESC, play_count DESC
-        LIMIT 10
-        """
+        query = _SQL_HOT_MEDIA.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
-            text = "🔥 热门媒体TOP10:\n"
+            lines = ["🔥 热门媒体TOP10:"]
             for idx, item in enumerate(result["results"], 1):
                 name = item[0] or "Unknown"
                 item_type = item[1] or ""
-                user_count = int(item[2] or 0)
-                play_count = int(item[3] or 0)
-                duration = float(item[4] or 0) / 3600
-                text += f"  {idx}. {name} [{item_type}]\n"
-                text += f"     {user_count}人观看 | {play_count}次播放 | {duration:.1f}小时\n"
-            return text.rstrip()
+                user_count = _to_int(item[2])
+                play_count = _to_int(item[3])
+                duration = _to_float(item[4]) / 3600
+                lines.append(f"  {idx}. {name} [{item_type}]")
+                lines.append(f"     {user_count}人观看 | {play_count}次播放 | {duration:.1f}小时")
+            return "\n".join(lines)
         return ""
 
-    def _get_popular_client(self, start: datetime, end: datetime) -> str:
+    def _get_popular_client(self, start: str, end: str, days: int) -> str:
         """获取最受欢迎客户端"""
-        query = f"""
-        SELECT ClientName, COUNT(*) as count
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        GROUP BY ClientName
-        ORDER BY count DESC
-        LIMIT 5
-        """
+        query = _SQL_POPULAR_CLIENT.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
-            text = "📱 最受欢迎客户端:\n"
+            lines = ["📱 最受欢迎客户端:"]
             for item in result["results"]:
                 client = item[0] or "Unknown"
-                count = int(item[1] or 0)
-                text += f"  · {client}: {count}次\n"
-            return text.rstrip()
+                count = _to_int(item[1])
+                lines.append(f"  · {client}: {count}次")
+            return "\n".join(lines)
         return ""
 
-    def _get_new_media(self, start: datetime, end: datetime) -> str:
+    def _get_new_media(self, start: str, end: str, days: int) -> str:
         """获取新增观看媒体统计"""
-        query = f"""
-        SELECT ItemType, COUNT(DISTINCT ItemName) as new_count
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        GROUP BY ItemType
-        """
+        query = _SQL_NEW_MEDIA.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
-            text = "🆕 新增观看媒体:\n"
+            lines = ["🆕 新增观看媒体:"]
             for item in result["results"]:
                 item_type = item[0] or "Unknown"
-                count = int(item[1] or 0)
-                text += f"  · {item_type}: {count}部\n"
-            return text.rstrip()
+                count = _to_int(item[1])
+                lines.append(f"  · {item_type}: {count}部")
+            return "\n".join(lines)
         return ""
 
-    def _get_cold_media(self) -> str:
+    def _get_cold_media(self, start: str, end: str, days: int) -> str:
         """获取冷门媒体(超过30天无人观看)"""
         thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d 00:00:00")
-        query = f"""
-        SELECT ItemName, ItemType, MAX(DateCreated) as last_play
-        FROM PlaybackActivity 
-        WHERE DateCreated < '{thirty_days_ago}'
-        GROUP BY ItemName, ItemType
-        ORDER BY last_play ASC
-        LIMIT 10
-        """
+        query = _SQL_COLD_MEDIA.format(before=thirty_days_ago)
         result = self._query_emby(query)
         if result and result.get("results"):
-            text = "❄️ 冷门媒体提醒(>30天无观看):\n"
+            lines = ["❄️ 冷门媒体提醒(>30天无观看):"]
             for item in result["results"]:
                 name = item[0] or "Unknown"
                 item_type = item[1] or ""
                 last_play = item[2] or ""
-                text += f"  · {name} [{item_type}] - 最后观看: {last_play[:10]}\n"
-            return text.rstrip()
+                lines.append(f"  · {name} [{item_type}] - 最后观看: {last_play[:10]}")
+            return "\n".join(lines)
         return ""
 
-    def _get_abnormal_users(self, start: datetime, end: datetime) -> str:
+    def _get_abnormal_users(self, start: str, end: str, days: int) -> str:
         """获取异常用户告警(基于播放频次)"""
-        query = f"""
-        SELECT UserName, COUNT(*) as play_count,
-               COUNT(DISTINCT DATE(DateCreated)) as active_days
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        GROUP BY UserName
-        HAVING play_count > 100
-        ORDER BY play_count DESC
-        """
+        query = _SQL_ABNORMAL_USERS.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
-            text = "⚠️ 异常活跃用户:\n"
+            lines = ["⚠️ 异常活跃用户:"]
             for item in result["results"]:
                 username = item[0] or "Unknown"
-                play_count = int(item[1] or 0)
-                active_days = int(item[2] or 0)
+                play_count = _to_int(item[1])
+                active_days = _to_int(item[2])
                 avg_daily = play_count / active_days if active_days > 0 else 0
-                text += f"  · {username}: {play_count}次播放 (日均{avg_daily:.1f}次)\n"
-            return text.rstrip()
+                lines.append(f"  · {username}: {play_count}次播放 (日均{avg_daily:.1f}次)")
+            return "\n".join(lines)
         return ""
 
-    def _get_trend_analysis(self, start: datetime, end: datetime, days: int) -> str:
+    def _get_trend_analysis(self, start: str, end: str, days: int) -> str:
         """获取观影趋势分析"""
-        query = f"""
-        SELECT DATE(DateCreated) as play_date, 
-               COUNT(*) as play_count,
-               SUM(PlayDuration) as duration
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        GROUP BY DATE(DateCreated)
-        ORDER BY play_date DESC
-        """
+        query = _SQL_TREND_ANALYSIS.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
             results_list = result["results"]
-            total_count = sum(int(item[1] or 0) for item in results_list)
-            total_duration = sum(float(item[2] or 0) for item in results_list)
+            # 单次遍历同时累计总量并找出最活跃日期
+            total_count = 0
+            total_duration = 0.0
+            max_date, max_count = None, -1
+            for item in results_list:
+                count = _to_int(item[1])
+                total_count += count
+                total_duration += _to_float(item[2])
+                if count > max_count:
+                    max_date, max_count = item[0], count
             active_days = len(results_list)
             
             avg_count = total_count / active_days if active_days > 0 else 0
             avg_duration = (total_duration / active_days / 3600) if active_days > 0 else 0
             
-            text = "📈 观影趋势分析:\n"
-            text += f"  · 统计周期: {days}天\n"
-            text += f"  · 日均播放: {avg_count:.1f}次\n"
-            text += f"  · 日均时长: {avg_duration:.1f}小时\n"
+            lines = [
+                "📈 观影趋势分析:",
+                f"  · 统计周期: {days}天",
+                f"  · 日均播放: {avg_count:.1f}次",
+                f"  · 日均时长: {avg_duration:.1f}小时"
+            ]
             
             if results_list:
-                max_day = max(results_list, key=lambda x: int(x[1] or 0))
-                text += f"  · 最活跃日期: {max_day[0]} ({int(max_day[1] or 0)}次)\n"
-            return text.rstrip()
+                lines.append(f"  · 最活跃日期: {max_date} ({max_count}次)")
+            return "\n".join(lines)
         return ""
 
-    def _get_time_distribution(self, start: datetime, end: datetime) -> str:
+    def _get_time_distribution(self, start: str, end: str, days: int) -> str:
         """获取观影时段分布"""
-        query = f"""
-        SELECT 
-            CASE 
-                WHEN CAST(strftime('%H', DateCreated) AS INTEGER) BETWEEN 0 AND 5 THEN '凌晨(00-06)'
-                WHEN CAST(strftime('%H', DateCreated) AS INTEGER) BETWEEN 6 AND 11 THEN '上午(06-12)'
-                WHEN CAST(strftime('%H', DateCreated) AS INTEGER) BETWEEN 12 AND 17 THEN '下午(12-18)'
-                ELSE '晚间(18-24)'
-            END as time_period,
-            COUNT(*) as count
-        FROM PlaybackActivity 
-        WHERE DateCreated >= '{start.strftime("%Y-%m-%d 00:00:00")}' 
-        AND DateCreated <= '{end.strftime("%Y-%m-%d 23:59:59")}'
-        GROUP BY time_period
-        ORDER BY count DESC
-        """
+        query = _SQL_TIME_DISTRIBUTION.format(start=start, end=end)
         result = self._query_emby(query)
         if result and result.get("results"):
-            text = "⏰ 观影时段分布:\n"
-            total = sum(int(item[1] or 0) for item in result["results"])
-            for item in result["results"]:
-                period = item[0] or "Unknown"
-                count = int(item[1] or 0)
+            lines = ["⏰ 观影时段分布:"]
+            periods = [(item[0] or "Unknown", _to_int(item[1])) for item in result["results"]]
+            total = sum(count for _, count in periods)
+            for period, count in periods:
                 percentage = (count / total * 100) if total > 0 else 0
-                text += f"  · {period}: {count}次 ({percentage:.1f}%)\n"
-            return text.rstrip()
+                lines.append(f"  · {period}: {count}次 ({percentage:.1f}%)")
+            return "\n".join(lines)
         return ""
+
+    # 报告内容项 -> 生成方法
+    _SECTION_HANDLERS = {
+        "totals": _get_totals,
+        "total_duration": _get_total_duration,
+        "total_count": _get_total_count,
+        "type_ranking": _get_type_ranking,
+        "user_ranking": _get_user_ranking,
+        "hot_media": _get_hot_media,
+        "popular_client": _get_popular_client,
+        "new_media": _get_new_media,
+        "cold_media": _get_cold_media,
+        "abnormal_user": _get_abnormal_users,
+        "trend_analysis": _get_trend_analysis,
+        "time_distribution": _get_time_distribution
+    }